@@ -0,0 +1,202 @@
+"""Offline benchmarks of the parsing, model and notification hot paths.
+
+Runs on recorded search result cards and on synthetic pages built from them, so
+that no network access or browser is needed. Results can be saved as JSON and
+compared with the results of another commit:
+
+    python -m benchmarks.run --output before.json
+    git checkout my-branch
+    python -m benchmarks.run --compare before.json
+"""
+
+import argparse
+import json
+import platform
+import re
+import statistics
+import subprocess
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Dict, List
+
+from bs4 import BeautifulSoup
+
+from src.models import Accommodation, SearchResults
+from src.notification_builder import NotificationBuilder
+from src.parser import (
+    Parser,
+    _parse_html_lxml,
+    _parse_records,
+    _parse_records_lxml,
+    lxml,
+    parse_accommodations_summaries,
+    parse_accommodations_summaries_lxml,
+)
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+SEARCH_URL = "https://trouverunlogement.lescrous.fr/tools/36/search"
+
+# Number of cards of each page size. "small" is the recorded page as is.
+PAGE_SIZES = {"small": 3, "medium": 100, "large": 3000}
+
+
+def recorded_cards() -> List[str]:
+    return (FIXTURES_DIR / "recorded_cards.html").read_text().splitlines()
+
+
+def synthetic_page(num_cards: int) -> str:
+    """Builds a search results page of `num_cards` cards, varying the recorded ones."""
+    templates = recorded_cards()
+    cards = []
+    for i in range(num_cards):
+        card = templates[i % len(templates)]
+        if i >= len(templates):
+            card = re.sub(r"/accommodations/\d+", f"/accommodations/{100000 + i}", card)
+            card = re.sub(
+                r'<p class="fr-badge">[^<]*</p>',
+                f'<p class="fr-badge">{200 + i % 400},{i % 100} €</p>',
+                card,
+            )
+        cards.append(card)
+
+    return (
+        f"""<html><body><h2 class="SearchResults-desktop fr-h4 svelte-11sc5my">{num_cards} logements trouvés</h2>"""
+        f"""<ul>{"".join(cards)}</ul></body></html>"""
+    )
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Returns the best and median time of `fn` over `repeat` runs, and its peak traced memory."""
+    fn()  # warm up
+
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        fn()
+        timings.append(perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "best_s": min(timings),
+        "median_s": statistics.median(timings),
+        "peak_memory_kib": peak / 1024,
+    }
+
+
+def page_benchmarks(html: str) -> Dict[str, Callable[[], object]]:
+    soup = BeautifulSoup(html, "html.parser")
+    accommodations = parse_accommodations_summaries(soup)
+    fields = [accommodation.model_dump(mode="json") for accommodation in accommodations]
+    records = _parse_records(soup)
+    search_results = SearchResults(
+        search_url=SEARCH_URL,  # type: ignore
+        count=len(accommodations),
+        accommodations=accommodations,
+    )
+    parser = Parser(fetcher=None, backend="bs4")  # type: ignore
+    warm_builder = NotificationBuilder()
+
+    benchmarks: Dict[str, Callable[[], object]] = {
+        "parse_bs4": lambda: parse_accommodations_summaries(
+            BeautifulSoup(html, "html.parser")
+        ),
+        "parse_records_bs4": lambda: _parse_records(BeautifulSoup(html, "html.parser")),
+        "count_bs4": lambda: parser._get_accomodations_count(soup),
+        "accommodation_models": lambda: [Accommodation(**f) for f in fields],
+        "records_to_models": lambda: [record.to_model() for record in records],
+        "render_cold": lambda: NotificationBuilder().search_results_notification(
+            search_results
+        ),
+        "render_warm": lambda: warm_builder.search_results_notification(search_results),
+    }
+    if lxml is not None:
+        benchmarks["parse_lxml"] = lambda: parse_accommodations_summaries_lxml(
+            _parse_html_lxml(html)
+        )
+        benchmarks["parse_records_lxml"] = lambda: _parse_records_lxml(
+            _parse_html_lxml(html)
+        )
+    return benchmarks
+
+
+def run(sizes: List[str], repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for size in sizes:
+        num_cards = PAGE_SIZES[size]
+        html = synthetic_page(num_cards)
+        for name, fn in page_benchmarks(html).items():
+            result = measure(fn, repeat)
+            result["cards_per_s"] = num_cards / result["median_s"]
+            results[f"{size}/{name}"] = result
+            print(
+                f"{size + '/' + name:<30} median {result['median_s'] * 1000:>10.3f} ms"
+                f"  {result['cards_per_s']:>12.0f} cards/s"
+                f"  peak {result['peak_memory_kib']:>10.1f} KiB"
+            )
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text())
+    print(f"\nCompared to {baseline_path} (commit {baseline.get('commit')}):")
+    for name, result in results.items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]
+        print(
+            f"{name:<30} time x{result['median_s'] / before['median_s']:>6.2f}"
+            f"  memory x{result['peak_memory_kib'] / max(before['peak_memory_kib'], 1e-9):>6.2f}"
+        )
+
+
+def current_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the parsing and notification hot paths."
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        choices=PAGE_SIZES.keys(),
+        default=list(PAGE_SIZES),
+        help="Page sizes to benchmark",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Timed runs per benchmark"
+    )
+    parser.add_argument("--output", type=Path, help="Save the results as JSON")
+    parser.add_argument("--compare", type=Path, help="JSON results to compare with")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+
+    if args.output:
+        args.output.write_text(
+            json.dumps(
+                {
+                    "commit": current_commit(),
+                    "python": platform.python_version(),
+                    "results": results,
+                },
+                indent=2,
+            )
+        )
+
+    if args.compare:
+        compare(results, args.compare)
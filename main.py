@@ -1,5 +1,7 @@
 import argparse
+import cProfile
 import logging
+from datetime import timedelta
 from typing import List
 
 import telepot
@@ -10,11 +12,18 @@ from selenium.webdriver.chrome.webdriver import WebDriver
 from chromedriver_py import binary_path  # this will get you the path variable
 
 from src.authenticator import Authenticator
-from src.parser import Parser
+from src.daemon import Daemon
+from src.delivery_queue import DeliveryQueue
+from src.metrics import metrics
 from src.models import UserConf
 from src.notification_builder import NotificationBuilder
+from src.rate_limiter import TokenBucket
+from src.seen_store import SeenStore
+from src.session_cache import SessionCache
+from src.session_manager import SessionManager
 from src.settings import Settings
 from src.telegram_notifier import TelegramNotifier
+from src.user_conf_store import open_user_conf_store
 
 logging.basicConfig(
     format="%(asctime)s %(name)s %(levelname)s: %(message)s",
@@ -24,18 +33,19 @@ logging.basicConfig(
 logger = logging.getLogger("accommodation_notifier")
 
 
-def load_users_conf() -> List[UserConf]:
+def default_users_conf() -> List[UserConf]:
+    """Configuration used when no USERS_CONF_PATH is set."""
     return [
         UserConf(
             conf_title="Me",
             telegram_id=settings.MY_TELEGRAM_ID,
-            search_url="https://trouverunlogement.lescrous.fr/tools/36/search?bounds=4.863088128353419_45.79119771932692_4.887077805782618_45.764140033383086",  # type:ignore
-            # search_url="https://trouverunlogement.lescrous.fr/tools/36/search",  # type:ignore
-            ignored_ids=[2755],
+            search_url=settings.DEFAULT_SEARCH_URL,  # type:ignore
+            ignored_ids=settings.DEFAULT_IGNORED_IDS,
         )
     ]
 
 
+@metrics.timer("create_driver")
 def create_driver(headless: bool = True) -> WebDriver:
     # Set up Chrome options
     chrome_options = Options()
@@ -67,6 +77,39 @@ if __name__ == "__main__":
         action="store_true",
         help="Run the script without headless mode",
     )
+    parser.add_argument(
+        "--engine",
+        choices=["selenium", "http"],
+        default="selenium",
+        help="How search pages are fetched. 'http' only uses the browser to log in, "
+        "then fetches pages with plain HTTP requests reusing the session cookies.",
+    )
+    parser.add_argument(
+        "--no-session-cache",
+        action="store_true",
+        help="Always log in, instead of reusing the session saved by a previous run",
+    )
+    parser.add_argument(
+        "--notify-all",
+        action="store_true",
+        help="Notify every available accommodation, not only the ones new or changed since the last notification",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running and check each configuration periodically, instead of once",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        metavar="PATH",
+        help="Write the collected timings and counters to this JSON file when exiting",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="Profile a single check of every configuration with cProfile, and write the stats to this file. "
+        "The searches and their result pages are then fetched one after the other.",
+    )
 
     args = parser.parse_args()
 
@@ -74,20 +117,87 @@ if __name__ == "__main__":
     bot = telepot.Bot(token=settings.TELEGRAM_BOT_TOKEN)
     bot.getMe()  # test if the bot is working
 
-    user_confs = load_users_conf()
+    conf_store = (
+        open_user_conf_store(settings.USERS_CONF_PATH)
+        if settings.USERS_CONF_PATH
+        else None
+    )
+    user_confs = conf_store.user_confs() if conf_store else default_users_conf()
+
+    session_cache = (
+        None
+        if args.no_session_cache
+        else SessionCache(
+            settings.SESSION_CACHE_PATH,
+            ttl=timedelta(seconds=settings.SESSION_CACHE_TTL_SECONDS),
+        )
+    )
+    session_manager = SessionManager(
+        Authenticator(
+            settings.MSE_EMAIL,
+            settings.MSE_PASSWORD,
+            timeout=settings.WAIT_TIMEOUT_SECONDS,
+        ),
+        driver_factory=lambda: create_driver(headless=not args.no_headless),
+        engine=args.engine,
+        cache=session_cache,
+        rate_limiter=TokenBucket(settings.MAX_REQUESTS_PER_SECOND),
+        browser_pool_size=settings.BROWSER_POOL_SIZE,
+        browser_max_uses=settings.BROWSER_MAX_USES,
+        browser_max_memory_growth=int(
+            settings.BROWSER_MAX_MEMORY_GROWTH_MB * 1024 * 1024
+        ),
+    )
 
-    driver = create_driver(headless=not args.no_headless)
-    Authenticator(settings.MSE_EMAIL, settings.MSE_PASSWORD).authenticate_driver(driver)
+    seen_store = (
+        None
+        if args.notify_all
+        else SeenStore(
+            settings.SEEN_STORE_PATH, ttl=timedelta(days=settings.SEEN_TTL_DAYS)
+        )
+    )
 
-    parser = Parser(driver)
-    notification_builder = NotificationBuilder()
-    notifier = TelegramNotifier(bot)
+    delivery_queue = DeliveryQueue(
+        TelegramNotifier(bot),
+        messages_per_second=settings.TELEGRAM_MAX_MESSAGES_PER_SECOND,
+        messages_per_chat_per_second=settings.TELEGRAM_MAX_MESSAGES_PER_CHAT_PER_SECOND,
+    )
 
-    for conf in user_confs:
-        logging.info(f"Handling configuration : {conf}")
-        search_results = parser.get_accommodations(conf.search_url)  # type: ignore
-        notification = notification_builder.search_results_notification(search_results)
-        if notification:
-            notifier.send_notification(conf.telegram_id, notification)
+    daemon = Daemon(
+        session_manager,
+        NotificationBuilder(
+            language=settings.NOTIFICATION_LANGUAGE,
+            parse_mode=settings.NOTIFICATION_PARSE_MODE,
+        ),
+        delivery_queue,
+        user_confs,
+        default_interval=settings.DAEMON_INTERVAL_SECONDS,
+        jitter=settings.DAEMON_JITTER,
+        max_workers=settings.MAX_WORKERS,
+        # The profiler only sees the main thread: fetch the result pages there.
+        max_page_workers=1 if args.profile else 4,
+        seen_store=seen_store,
+        conf_store=conf_store,
+        reload_interval=settings.USERS_CONF_RELOAD_INTERVAL_SECONDS,
+    )
 
-    driver.quit()
+    if settings.METRICS_PORT is not None:
+        metrics.serve(settings.METRICS_PORT)
+
+    try:
+        if args.profile:
+            profiler = cProfile.Profile()
+            profiler.runcall(daemon.run_once, inline=True)
+            profiler.dump_stats(args.profile)
+            logger.info(f"Profile written to {args.profile}")
+        elif args.daemon:
+            daemon.run()
+        else:
+            daemon.run_once()
+    finally:
+        if args.metrics_json:
+            metrics.dump_json(args.metrics_json)
+        session_manager.close()
+        delivery_queue.close()
+        if seen_store:
+            seen_store.close()
@@ -2,9 +2,11 @@ import logging
 from selenium.webdriver.chrome.webdriver import WebDriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from time import sleep
+from selenium.webdriver.support import expected_conditions as EC
 
+from src.metrics import metrics
 from src.settings import Settings
+from src.waits import wait_for
 
 settings = Settings()
 
@@ -14,34 +16,41 @@ logger = logging.getLogger(__name__)
 class Authenticator:
     """Class that handles the authentication to the CROUS website and returns a WebDriver object that is authenticated."""
 
-    def __init__(self, email: str, password: str, delay: int = 2):
+    def __init__(self, email: str, password: str, timeout: float = 10):
         self.email = email
         self.password = password
-        self.delay = delay
+        self.timeout = timeout
 
+    @metrics.timer("authenticate")
     def authenticate_driver(self, driver: WebDriver) -> None:
         """Authenticates the given WebDriver object to the CROUS website."""
 
         logger.info("Authenticating to the CROUS website...")
 
-        sleep(self.delay)
-
         # Step 1: Go to the login page
 
         logger.info(f"Going to the login page: {settings.MSE_LOGIN_URL}")
         driver.get(settings.MSE_LOGIN_URL)
-        sleep(self.delay)
 
         # Step 2: choose the correct authentication method
         logger.info("Choosing the correct authentication method")
-        mse_connect_button = driver.find_element(By.CLASS_NAME, "loginapp-button")
+        mse_connect_button = wait_for(
+            driver,
+            EC.presence_of_element_located((By.CLASS_NAME, "loginapp-button")),
+            "the authentication method button",
+            self.timeout,
+        )
         # mse_connect_button.click() # somehow doesn't work. We simulate a click instead :
         driver.execute_script("arguments[0].click();", mse_connect_button)
-        sleep(self.delay)
 
         # Step 3: Input credentials and submit
         logger.info("Inputting credentials")
-        username_input = driver.find_element(By.NAME, "j_username")
+        username_input = wait_for(
+            driver,
+            EC.presence_of_element_located((By.NAME, "j_username")),
+            "the login form",
+            self.timeout,
+        )
         password_input = driver.find_element(By.NAME, "j_password")
 
         username_input.send_keys(self.email)
@@ -50,7 +59,12 @@ class Authenticator:
         logger.info("Submitting the form")
         password_input.send_keys(Keys.RETURN)
 
-        sleep(self.delay)
+        wait_for(
+            driver,
+            EC.staleness_of(password_input),
+            "the login form submission",
+            self.timeout,
+        )
 
         # Step 4: Validate the rules
         self._validate_rules(driver)
@@ -67,12 +81,20 @@ class Authenticator:
 
         driver.get("https://trouverunlogement.lescrous.fr/tools/36/rules")
 
-        sleep(self.delay)
-
         # <button class="fr-btn" type="submit" name="searchSubmit">Passer à la recherche de logements</button>
 
-        validate_button = driver.find_element(By.NAME, "searchSubmit")
+        validate_button = wait_for(
+            driver,
+            EC.element_to_be_clickable((By.NAME, "searchSubmit")),
+            "the rules validation button",
+            self.timeout,
+        )
 
         validate_button.click()
 
-        sleep(self.delay)
+        wait_for(
+            driver,
+            EC.staleness_of(validate_button),
+            "the rules validation",
+            self.timeout,
+        )
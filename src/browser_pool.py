@@ -0,0 +1,270 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Sequence
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.webdriver import WebDriver
+
+from src.fetchers import SeleniumFetcher, SessionExpiredError
+from src.metrics import metrics
+from src.settings import Settings
+
+settings = Settings()
+
+logger = logging.getLogger(__name__)
+
+# Resources a search page doesn't need to list the accommodations: the image
+# URLs are read from the cards, the images themselves are never used.
+BLOCKED_URL_PATTERNS = [
+    "*.jpg",
+    "*.jpeg",
+    "*.png",
+    "*.gif",
+    "*.webp",
+    "*.svg",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+]
+
+
+class BrowserPoolClosedError(SessionExpiredError):
+    """Raised when fetching from a closed pool, e.g. one closed when the session was refreshed.
+
+    It is a `SessionExpiredError`, so that callers still holding the pool retry with
+    the fetcher of the new session.
+    """
+
+
+class _PooledDriver:
+    def __init__(self, driver: WebDriver, timeout: float):
+        self.driver = driver
+        self.fetcher = SeleniumFetcher(driver, timeout=timeout)
+        self.uses = 0
+        self.baseline_memory: int | None = None
+
+
+class BrowserPool:
+    """Pool of warm, authenticated WebDrivers, fetching pages like a `SeleniumFetcher`.
+
+    Up to `size` browsers are started, each authenticated with the `cookies` of a
+    logged-in session, and reused across fetches: concurrent fetches use different
+    browsers, instead of waiting for a single one. Browsers that fail a health
+    check are replaced, and each one is recycled after `max_uses` fetches or once
+    its JavaScript heap grew by more than `max_memory_growth` bytes, to contain
+    Chrome's leaks. Images and fonts are not downloaded.
+
+    Used as a context manager, all the browsers are started upfront and quit on exit:
+
+        with BrowserPool(create_driver, cookies) as pool:
+            search_results = Parser(pool).get_accommodations(search_url)
+    """
+
+    def __init__(
+        self,
+        driver_factory: Callable[[], WebDriver],
+        cookies: List[dict],
+        size: int = 2,
+        max_uses: int = 100,
+        max_memory_growth: int = 200 * 1024 * 1024,
+        timeout: float = 10,
+        drivers: Sequence[WebDriver] = (),
+    ):
+        """`drivers` are already authenticated browsers to adopt, e.g. the one used to log in."""
+        self.driver_factory = driver_factory
+        self.cookies = cookies
+        self.size = size
+        self.max_uses = max_uses
+        self.max_memory_growth = max_memory_growth
+        self.timeout = timeout
+        self._idle: queue.Queue[_PooledDriver] = queue.Queue()
+        self._started = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+        for driver in drivers[:size]:
+            self._block_resources(driver)
+            self._idle.put(_PooledDriver(driver, timeout))
+            self._started += 1
+
+    def fetch(self, url: str) -> str:
+        with self.driver() as pooled:
+            html = pooled.fetcher.fetch(url)
+            pooled.uses += 1
+            return html
+
+    @contextmanager
+    def driver(self) -> Iterator[_PooledDriver]:
+        """Lends a healthy browser for exclusive use, waiting for one if they are all busy."""
+        pooled = self._acquire()
+        healthy = False
+        try:
+            yield pooled
+            healthy = True
+        finally:
+            self._release(pooled, healthy)
+
+    def warm_up(self) -> None:
+        """Starts the missing browsers, concurrently."""
+        missing = self.size - self._started
+        if missing <= 0:
+            return
+
+        logger.info(f"Starting {missing} browsers")
+        with ThreadPoolExecutor(missing) as executor:
+            futures = [
+                executor.submit(self._start_driver_if_below_size)
+                for _ in range(missing)
+            ]
+            for future in futures:
+                try:
+                    pooled = future.result()
+                except BrowserPoolClosedError:
+                    continue
+                except Exception:
+                    logger.exception("Failed to start a browser")
+                    continue
+                if pooled:
+                    self._idle.put(pooled)
+
+    def close(self) -> None:
+        """Quits the idle browsers, and the busy ones as soon as they are released.
+
+        Fetches waiting for a browser, and later ones, raise a `BrowserPoolClosedError`.
+        """
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def __enter__(self) -> "BrowserPool":
+        self.warm_up()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _acquire(self) -> _PooledDriver:
+        while True:
+            pooled = self._take()
+            if self._is_healthy(pooled):
+                return pooled
+
+            logger.warning("A browser failed its health check, replacing it")
+            self._discard(pooled)
+
+    def _take(self) -> _PooledDriver:
+        """Returns an idle browser, or a new one if the pool isn't full."""
+        while True:
+            if self._closed:
+                raise BrowserPoolClosedError("The browser pool is closed")
+
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            pooled = self._start_driver_if_below_size()
+            if pooled:
+                return pooled
+
+            # Wake up regularly: a discarded browser frees a place without being put
+            # back, and closing the pool must be noticed.
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def _release(self, pooled: _PooledDriver, healthy: bool) -> None:
+        if self._closed:
+            self._discard(pooled)
+        elif not healthy and not self._is_healthy(pooled):
+            logger.warning("A browser failed during a fetch, replacing it")
+            self._discard(pooled)
+        elif pooled.uses >= self.max_uses:
+            logger.info(f"Recycling a browser after {pooled.uses} uses")
+            self._discard(pooled)
+        elif self._memory_grew_too_much(pooled):
+            logger.info("Recycling a browser whose memory usage grew too much")
+            self._discard(pooled)
+        else:
+            self._idle.put(pooled)
+
+    def _discard(self, pooled: _PooledDriver) -> None:
+        """Quits the browser, freeing its place in the pool for a new one."""
+        if not self._closed:
+            metrics.inc("browsers_recycled_total")
+        self._quit(pooled)
+        with self._lock:
+            self._started -= 1
+
+    def _start_driver_if_below_size(self) -> _PooledDriver | None:
+        with self._lock:
+            if self._closed:
+                raise BrowserPoolClosedError("The browser pool is closed")
+            if self._started >= self.size:
+                return None
+            self._started += 1
+
+        try:
+            pooled = self._start_driver()
+        except Exception:
+            with self._lock:
+                self._started -= 1
+            raise
+
+        if self._closed:  # closed while the browser was starting
+            self._discard(pooled)
+            raise BrowserPoolClosedError("The browser pool is closed")
+        return pooled
+
+    def _start_driver(self) -> _PooledDriver:
+        driver = self.driver_factory()
+        # Cookies can only be added for the domain currently loaded.
+        driver.get(settings.CROUS_BASE_URL)
+        for cookie in self.cookies:
+            driver.add_cookie(cookie)
+        self._block_resources(driver)
+        return _PooledDriver(driver, self.timeout)
+
+    def _block_resources(self, driver: WebDriver) -> None:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd(
+                "Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS}
+            )
+        except (AttributeError, WebDriverException) as e:  # not a Chromium browser
+            logger.warning(f"Could not block images and fonts: {e}")
+
+    def _is_healthy(self, pooled: _PooledDriver) -> bool:
+        try:
+            return pooled.driver.execute_script("return 1") == 1
+        except WebDriverException:
+            return False
+
+    def _memory_grew_too_much(self, pooled: _PooledDriver) -> bool:
+        try:
+            memory = pooled.driver.execute_script(
+                "return performance.memory ? performance.memory.usedJSHeapSize : null"
+            )
+        except WebDriverException:
+            return False
+        if memory is None:
+            return False
+
+        if pooled.baseline_memory is None:
+            pooled.baseline_memory = memory
+            return False
+        return memory - pooled.baseline_memory > self.max_memory_growth
+
+    def _quit(self, pooled: _PooledDriver) -> None:
+        try:
+            pooled.driver.quit()
+        except Exception:
+            logger.exception("Failed to quit a browser")
@@ -0,0 +1,340 @@
+import heapq
+import logging
+import random
+import signal
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from functools import partial
+from math import inf
+from time import monotonic
+from typing import Dict, List, Tuple
+
+from src.delivery_queue import DeliveryQueue
+from src.fetchers import SessionExpiredError
+from src.metrics import metrics
+from src.models import (
+    Notification,
+    SearchGroup,
+    SearchRecords,
+    SearchResults,
+    UserConf,
+)
+from src.notification_builder import NotificationBuilder
+from src.parser import Parser
+from src.planner import plan_searches, records_for_conf
+from src.seen_store import SeenStore
+from src.session_manager import SessionManager
+from src.telegram_notifier import TelegramNotifier
+from src.user_conf_store import UserConfStore
+
+logger = logging.getLogger(__name__)
+
+
+class Daemon:
+    """Keeps one authenticated session alive and checks each configuration on its own interval.
+
+    Configurations sharing the same search are grouped, so that each distinct search
+    is fetched once and its results fanned out to every subscriber. With a `seen_store`,
+    only the accommodations new or changed since the last notification are sent, and
+    they are recorded as seen once the notification was delivered.
+
+    Up to `max_workers` searches are checked concurrently, notifications being sent
+    as soon as a check is done. The session is refreshed automatically when the
+    website rejects it, and the daemon stops cleanly on SIGTERM or SIGINT.
+
+    With a `conf_store`, the configurations are reloaded while running whenever
+    the store changes, checking it every `reload_interval` seconds.
+
+    When the results of a search did not change since its previous check, the
+    notifications are not built again: with a `seen_store`, the accommodations
+    already notified are only kept from being evicted, and without one the previous
+    notifications are sent again. Accommodations whose notification failed are
+    still notified on the next check.
+    """
+
+    def __init__(
+        self,
+        session_manager: SessionManager,
+        notification_builder: NotificationBuilder,
+        notifier: TelegramNotifier | DeliveryQueue,
+        user_confs: List[UserConf],
+        default_interval: float = 300,
+        jitter: float = 0.1,
+        max_workers: int = 1,
+        max_page_workers: int = 4,
+        seen_store: SeenStore | None = None,
+        conf_store: UserConfStore | None = None,
+        reload_interval: float = 30,
+    ):
+        self.session_manager = session_manager
+        self.notification_builder = notification_builder
+        self.notifier = notifier
+        self.user_confs = user_confs
+        self.search_groups = plan_searches(user_confs)
+        self.default_interval = default_interval
+        self.jitter = jitter
+        self.max_workers = max_workers
+        self.max_page_workers = max_page_workers
+        self.seen_store = seen_store
+        self.conf_store = conf_store
+        self.reload_interval = reload_interval
+        self._parser: Parser | None = None
+        self._parser_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        # Group, search records and notifications of the last check of each search
+        self._last_checks: Dict[
+            str, Tuple[SearchGroup, SearchRecords, Dict[int, Notification]]
+        ] = {}
+
+    def run_once(self, inline: bool = False) -> None:
+        """Checks every configuration once.
+
+        With `inline`, the searches are checked one after the other in the calling
+        thread, e.g. so that a profiler sees the work.
+        """
+        if inline:
+            for group in self.search_groups:
+                self._check_and_log_errors(group)
+            return
+
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            futures = {
+                executor.submit(self.check, group): group
+                for group in self.search_groups
+            }
+            for future in as_completed(futures):
+                if future.exception():
+                    logger.error(
+                        f"Failed to check search {futures[future].search_url}",
+                        exc_info=future.exception(),
+                    )
+
+    def run(self) -> None:
+        """Checks the configurations forever, until `stop` is called or a termination signal is received."""
+        previous_handlers = {
+            signum: signal.signal(signum, lambda *_: self.stop())
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+
+        schedule = self._build_schedule([])
+        next_reload = monotonic() + self.reload_interval if self.conf_store else inf
+
+        # Checks still running, by search, so that a slow search is not checked twice at once.
+        in_flight: dict[str, Future] = {}
+        executor = ThreadPoolExecutor(self.max_workers)
+
+        logger.info(
+            f"Daemon started with {len(self.user_confs)} configurations "
+            f"and {len(schedule)} distinct searches"
+        )
+        try:
+            while (schedule or self.conf_store) and not self._stop_event.is_set():
+                if monotonic() >= next_reload:
+                    next_reload = monotonic() + self.reload_interval
+                    if self._reload_user_confs():
+                        schedule = self._build_schedule(schedule)
+
+                next_check = schedule[0][0] if schedule else inf
+                if self._stop_event.wait(
+                    max(0, min(next_check, next_reload) - monotonic())
+                ):
+                    break
+                if next_check > monotonic():
+                    continue  # woken up to reload the configurations
+
+                _, key, group = schedule[0]
+                heapq.heapreplace(
+                    schedule, (monotonic() + self._next_interval(group), key, group)
+                )
+                if key in in_flight and not in_flight[key].done():
+                    logger.warning(
+                        f"Previous check of {group.search_url} still running, skipping"
+                    )
+                    continue
+                in_flight[key] = executor.submit(self._check_and_log_errors, group)
+        finally:
+            # Let running checks finish, but drop the ones that haven't started yet.
+            executor.shutdown(wait=True, cancel_futures=True)
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+        logger.info("Daemon stopped")
+
+    def stop(self) -> None:
+        logger.info("Stopping the daemon...")
+        self._stop_event.set()
+
+    @metrics.timer("check")
+    def check(self, group: SearchGroup) -> None:
+        """Fetches the search of the group once and notifies each of its configurations."""
+        logger.info(
+            f"Checking {group.search_url} for {len(group.user_confs)} configurations"
+        )
+        parser = self._get_parser()
+        try:
+            search_records = parser.get_records(group.search_url)
+        except SessionExpiredError:
+            search_records = self._refresh_parser(parser).get_records(group.search_url)
+
+        key = str(group.search_url)
+        last_check = self._last_checks.get(key)
+        if last_check and last_check[0] is group and last_check[1] is search_records:
+            logger.info(f"No change on {group.search_url}")
+            if not self.seen_store:
+                self._send_notifications(group, search_records, {}, last_check[2])
+                return
+
+            results_by_conf = self._results_by_conf(group, search_records)
+            if not any(results.accommodations for results in results_by_conf.values()):
+                # Everything was notified already: only keep it from being evicted
+                self.seen_store.refresh_last_seen(
+                    group.user_confs,
+                    [r.id for r in search_records.records if r.id is not None],
+                )
+                return
+        else:
+            results_by_conf = self._results_by_conf(group, search_records)
+
+        with metrics.timer("build_notifications"):
+            notifications = self.notification_builder.search_results_notifications(
+                results_by_conf
+            )
+        self._last_checks[key] = (group, search_records, notifications)
+        self._send_notifications(group, search_records, results_by_conf, notifications)
+
+    def _send_notifications(
+        self,
+        group: SearchGroup,
+        search_records: SearchRecords,
+        results_by_conf: Dict[int, SearchResults],
+        notifications: Dict[int, Notification],
+    ) -> None:
+        """Sends the notifications, recording the accommodations as seen once delivered.
+
+        Configurations missing from `results_by_conf`, e.g. because their seen store
+        lookup failed, are not recorded, so that they are notified on the next check.
+        """
+        for i, conf in enumerate(group.user_confs):
+            mark_seen = partial(self._mark_seen, conf, search_records)
+            if i not in notifications:
+                if i in results_by_conf:
+                    mark_seen()  # nothing new to send
+                continue
+            try:
+                self.notifier.send_notification(
+                    conf.telegram_id,
+                    notifications[i],
+                    on_sent=mark_seen if self.seen_store else None,
+                )
+            except Exception:
+                logger.exception(f"Failed to notify configuration {conf.conf_title}")
+
+    def _mark_seen(self, conf: UserConf, search_records: SearchRecords) -> None:
+        if not self.seen_store:
+            return
+        try:
+            self.seen_store.mark_seen(
+                conf, records_for_conf(search_records, conf).records
+            )
+        except Exception:
+            logger.exception(
+                f"Failed to record the accommodations seen by {conf.conf_title}"
+            )
+
+    def _results_by_conf(
+        self, group: SearchGroup, search_records: SearchRecords
+    ) -> Dict[int, SearchResults]:
+        """Returns the search results to notify to each configuration of the group, by index in the group."""
+        results_by_conf: Dict[int, SearchResults] = {}
+        for i, conf in enumerate(group.user_confs):
+            try:
+                results_by_conf[i] = self._results_for_conf(conf, search_records)
+            except Exception:
+                logger.exception(f"Failed to handle configuration {conf.conf_title}")
+        return results_by_conf
+
+    def _results_for_conf(
+        self, conf: UserConf, search_records: SearchRecords
+    ) -> SearchResults:
+        logger.info(f"Handling configuration : {conf}")
+        search_records = records_for_conf(search_records, conf)
+        if self.seen_store:
+            search_records = search_records._replace(
+                records=self.seen_store.new_or_changed(conf, search_records.records)
+            )
+        # Only the accommodations to notify are validated into models
+        return search_records.to_model()
+
+    def _build_schedule(
+        self, previous_schedule: List[Tuple[float, str, SearchGroup]]
+    ) -> List[Tuple[float, str, SearchGroup]]:
+        """Returns the heap of (next check time, search, group) of the current search groups.
+
+        Searches already scheduled keep their next check time, new ones are checked right away.
+        """
+        next_checks = {key: next_check for next_check, key, _ in previous_schedule}
+        now = monotonic()
+        schedule = [
+            (next_checks.get(str(group.search_url), now), str(group.search_url), group)
+            for group in self.search_groups
+        ]
+        heapq.heapify(schedule)
+        return schedule
+
+    def _reload_user_confs(self) -> bool:
+        assert self.conf_store
+        try:
+            if not self.conf_store.reload_if_changed():
+                return False
+        except Exception:
+            logger.exception(
+                "Failed to reload the configurations, keeping the current ones"
+            )
+            return False
+
+        self.user_confs = self.conf_store.user_confs()
+        self.search_groups = plan_searches(self.user_confs)
+        search_urls = {str(group.search_url) for group in self.search_groups}
+        self._last_checks = {
+            key: last_check
+            for key, last_check in self._last_checks.items()
+            if key in search_urls
+        }
+        logger.info(
+            f"Reloaded {len(self.user_confs)} configurations "
+            f"and {len(self.search_groups)} distinct searches"
+        )
+        return True
+
+    def _check_and_log_errors(self, group: SearchGroup) -> None:
+        try:
+            self.check(group)
+        except Exception:
+            logger.exception(f"Failed to check search {group.search_url}")
+
+    def _get_parser(self) -> Parser:
+        with self._parser_lock:
+            if not self._parser:
+                self._parser = Parser(
+                    self.session_manager.get_fetcher(),
+                    max_page_workers=self.max_page_workers,
+                )
+            return self._parser
+
+    def _refresh_parser(self, expired: Parser) -> Parser:
+        with self._parser_lock:
+            # Several workers may notice the expiry at once: only the first one logs in again.
+            if self._parser is expired:
+                logger.info("The session has expired")
+                self._parser = Parser(
+                    self.session_manager.refresh(),
+                    max_page_workers=self.max_page_workers,
+                )
+            return self._parser
+
+    def _next_interval(self, group: SearchGroup) -> float:
+        # The shared search is checked as often as its most demanding subscriber wants.
+        interval = min(
+            conf.check_interval or self.default_interval for conf in group.user_confs
+        )
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
@@ -0,0 +1,173 @@
+import logging
+import queue
+import threading
+from collections import deque
+from time import sleep
+from typing import Callable, Deque, Dict, Tuple
+
+import urllib3.exceptions
+from telepot.exception import BadHTTPResponse, TelegramError, TooManyRequestsError  # type: ignore
+
+from src.metrics import metrics
+from src.models import Notification
+from src.rate_limiter import TokenBucket
+from src.telegram_notifier import TelegramNotifier, split_message
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryQueue:
+    """Sends notifications in the background, within Telegram's rate limits.
+
+    `send_notification` only enqueues the notification, so that a slow or failing
+    send never blocks the caller. Worker threads split long notifications into
+    several messages and send them while respecting a global and a per-chat rate
+    limit. Sends are retried with exponential backoff, waiting as long as Telegram
+    asks to when it answers 429 Too Many Requests.
+
+    Each chat has its own queue, served by one worker at a time: the notifications
+    of a chat are sent in order, and a chat waiting for its rate limit doesn't hold
+    up the workers that could serve other chats.
+    """
+
+    def __init__(
+        self,
+        notifier: TelegramNotifier,
+        max_workers: int = 4,
+        messages_per_second: float = 25,
+        messages_per_chat_per_second: float = 1,
+        max_retries: int = 5,
+        backoff: float = 1,
+    ):
+        self.notifier = notifier
+        self.messages_per_chat_per_second = messages_per_chat_per_second
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._global_rate_limiter = TokenBucket(messages_per_second)
+        self._chat_rate_limiters: Dict[str, TokenBucket] = {}
+        self._chat_rate_limiters_lock = threading.Lock()
+        # Notifications waiting to be sent, by chat. A chat is in there while its
+        # notifications are queued or being sent.
+        self._pending: Dict[
+            str, Deque[Tuple[Notification, Callable[[], None] | None]]
+        ] = {}
+        self._pending_lock = threading.Lock()
+        # Chats with notifications to send and no worker sending them
+        self._ready_chats: queue.Queue[str | None] = queue.Queue()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"delivery-{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def send_notification(
+        self,
+        telegramId: str,
+        notification: Notification,
+        on_sent: Callable[[], None] | None = None,
+    ) -> None:
+        """Enqueues the notification, `on_sent` being called by a worker once it was delivered."""
+        with self._pending_lock:
+            if telegramId in self._pending:
+                self._pending[telegramId].append((notification, on_sent))
+                return
+            self._pending[telegramId] = deque([(notification, on_sent)])
+        self._ready_chats.put(telegramId)
+
+    def close(self) -> None:
+        """Waits for the queued notifications to be sent, then stops the workers."""
+        self._ready_chats.join()
+        for _ in self._workers:
+            self._ready_chats.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def __enter__(self) -> "DeliveryQueue":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _work(self) -> None:
+        while (telegram_id := self._ready_chats.get()) is not None:
+            with self._pending_lock:
+                notification, on_sent = self._pending[telegram_id].popleft()
+
+            self._send(telegram_id, notification, on_sent)
+
+            # Serve the other ready chats before the next notification of this one.
+            with self._pending_lock:
+                if self._pending[telegram_id]:
+                    self._ready_chats.put(telegram_id)
+                else:
+                    del self._pending[telegram_id]
+            self._ready_chats.task_done()
+
+    def _send(
+        self,
+        telegram_id: str,
+        notification: Notification,
+        on_sent: Callable[[], None] | None,
+    ) -> None:
+        try:
+            # The messages of a notification are sent in order, by the same worker.
+            for message in split_message(notification.message):
+                self._send_with_retries(telegram_id, message, notification.parse_mode)
+        except Exception:
+            metrics.inc("notifications_failed_total")
+            logger.exception(f"Failed to send a notification to {telegram_id}")
+            return
+
+        metrics.inc("notifications_sent_total")
+        if on_sent:
+            try:
+                on_sent()
+            except Exception:
+                logger.exception(
+                    f"Failed to handle the notification sent to {telegram_id}"
+                )
+
+    def _send_with_retries(
+        self, telegram_id: str, message: str, parse_mode: str
+    ) -> None:
+        for attempt in range(self.max_retries + 1):
+            # The chat's own limit first, so that waiting for it doesn't waste global tokens.
+            self._chat_rate_limiter(telegram_id).acquire()
+            self._global_rate_limiter.acquire()
+            try:
+                self.notifier.send_message(telegram_id, message, parse_mode=parse_mode)
+                return
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None or attempt == self.max_retries:
+                    raise
+                metrics.inc("telegram_retries_total")
+                logger.warning(
+                    f"Sending to {telegram_id} failed ({e}), retrying in {delay:.1f}s"
+                )
+                sleep(delay)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float | None:
+        """Returns how long to wait before retrying after `error`, or None if it is not worth retrying."""
+        if isinstance(error, TooManyRequestsError):
+            parameters = error.json.get("parameters") or {}
+            return parameters.get("retry_after", self.backoff * 2**attempt)
+
+        if isinstance(error, TelegramError) and error.error_code < 500:
+            return None  # e.g. the bot was blocked by the user
+
+        if isinstance(
+            error, (TelegramError, BadHTTPResponse, urllib3.exceptions.HTTPError)
+        ):
+            return self.backoff * 2**attempt
+
+        return None
+
+    def _chat_rate_limiter(self, telegram_id: str) -> TokenBucket:
+        with self._chat_rate_limiters_lock:
+            if telegram_id not in self._chat_rate_limiters:
+                self._chat_rate_limiters[telegram_id] = TokenBucket(
+                    self.messages_per_chat_per_second
+                )
+            return self._chat_rate_limiters[telegram_id]
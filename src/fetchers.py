@@ -0,0 +1,197 @@
+import logging
+import threading
+from typing import Dict, Protocol, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.chrome.webdriver import WebDriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+
+from src.metrics import metrics
+from src.rate_limiter import TokenBucket
+from src.waits import wait_for
+
+logger = logging.getLogger(__name__)
+
+# Being redirected to one of these means the session is no longer accepted.
+SESSION_REJECTED_URL_MARKERS = ("/login", "/connect", "/rules")
+
+# A page with none of these doesn't contain the search results, e.g. because they
+# are rendered client-side.
+SEARCH_RESULTS_MARKERS = ("SearchResults-desktop", "fr-card")
+
+
+class SessionExpiredError(Exception):
+    """Raised when the website redirects a fetch to the login or rules page."""
+
+
+def _is_rejected_url(url: str) -> bool:
+    return any(marker in url for marker in SESSION_REJECTED_URL_MARKERS)
+
+
+class Fetcher(Protocol):
+    """Something that returns the HTML source of a page given its URL."""
+
+    def fetch(self, url: str) -> str: ...
+
+
+class SeleniumFetcher:
+    """Fetches pages by loading them in a (possibly authenticated) WebDriver.
+
+    The search results are rendered client-side, so the page source is only read
+    once the results heading or a result card is displayed.
+
+    A WebDriver can only load one page at a time, so concurrent fetches are serialized.
+    """
+
+    def __init__(self, driver: WebDriver, timeout: float = 10):
+        self.driver = driver
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def fetch(self, url: str) -> str:
+        with self._lock, metrics.timer("fetch"):
+            html = self._fetch(url)
+        metrics.inc("pages_fetched_total", engine="selenium")
+        return html
+
+    def _fetch(self, url: str) -> str:
+        self.driver.get(url)
+        if self.driver.current_url != url and _is_rejected_url(self.driver.current_url):
+            raise SessionExpiredError(f"Redirected to {self.driver.current_url}")
+        try:
+            wait_for(
+                self.driver,
+                EC.any_of(
+                    EC.presence_of_element_located(
+                        (By.CSS_SELECTOR, "h2.SearchResults-desktop")
+                    ),
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "div.fr-card")),
+                ),
+                "the search results",
+                self.timeout,
+            )
+        except TimeoutException:
+            logger.warning(
+                f"Search results did not render on {url}, parsing the page anyway"
+            )
+        return self.driver.page_source
+
+
+class HttpFetcher:
+    """Fetches pages with plain HTTP requests over a pooled keep-alive session.
+
+    The session is expected to carry the cookies of an authenticated browser
+    session, see `HttpFetcher.from_driver`. It can be shared between threads; an
+    optional `rate_limiter` then bounds the overall request rate.
+
+    Pages are fetched again conditionally, with the ETag and Last-Modified the
+    server sent last time: a 304 Not Modified answer is served from memory.
+
+    JavaScript is not run: if the website only renders the search results
+    client-side, the pages have no results and a warning is logged.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        timeout: float = 10,
+        rate_limiter: TokenBucket | None = None,
+    ):
+        self.session = session
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        # (ETag, Last-Modified, body) of the last response of each URL that had validators
+        self._validated_pages: Dict[str, Tuple[str | None, str | None, str]] = {}
+
+    @classmethod
+    def from_cookies(
+        cls,
+        cookies: list[dict],
+        user_agent: str | None = None,
+        pool_maxsize: int = 10,
+        timeout: float = 10,
+        rate_limiter: TokenBucket | None = None,
+    ) -> "HttpFetcher":
+        """Builds a fetcher whose session carries the given Selenium-style cookies."""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        if user_agent:
+            session.headers["User-Agent"] = user_agent
+
+        for cookie in cookies:
+            session.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie.get("domain", ""),
+                path=cookie.get("path", "/"),
+            )
+
+        return cls(session, timeout=timeout, rate_limiter=rate_limiter)
+
+    @classmethod
+    def from_driver(cls, driver: WebDriver, **kwargs) -> "HttpFetcher":
+        """Builds a fetcher reusing the cookies and user agent of an authenticated WebDriver."""
+        logger.info("Exporting cookies from the WebDriver session")
+        return cls.from_cookies(
+            driver.get_cookies(),
+            user_agent=driver.execute_script("return navigator.userAgent"),
+            **kwargs,
+        )
+
+    def fetch(self, url: str) -> str:
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+        headers = {}
+        validated_page = self._validated_pages.get(url)
+        if validated_page:
+            etag, last_modified, _ = validated_page
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        with metrics.timer("fetch"):
+            response = self.session.get(url, timeout=self.timeout, headers=headers)
+        if response.history and _is_rejected_url(response.url):
+            raise SessionExpiredError(f"Redirected to {response.url}")
+
+        if response.status_code == 304 and validated_page:
+            metrics.inc("pages_not_modified_total")
+            return validated_page[2]
+
+        response.raise_for_status()
+        metrics.inc("pages_fetched_total", engine="http")
+        if not any(marker in response.text for marker in SEARCH_RESULTS_MARKERS):
+            logger.warning(
+                f"No search results in {url}: they may be rendered client-side, "
+                "which the http engine doesn't support"
+            )
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self._validated_pages[url] = (etag, last_modified, response.text)
+        return response.text
+
+    def is_authenticated(self, check_url: str) -> bool:
+        """Cheaply checks that the session is still accepted by the website.
+
+        The check page must load without being redirected to the login or rules page.
+        """
+        try:
+            response = self.session.get(check_url, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.warning(f"Could not check the session: {e}")
+            return False
+
+        if not response.ok:
+            return False
+
+        return not _is_rejected_url(response.url)
@@ -1,4 +1,5 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import List, NamedTuple, Optional
 
 from pydantic import Field, HttpUrl, BaseModel
 
@@ -11,14 +12,55 @@ class Accommodation(BaseModel):
     image_url: HttpUrl | None = None
 
 
+class AccommodationRecord(NamedTuple):
+    """Compact, unvalidated form of an `Accommodation`, used while parsing and deduplicating pages.
+
+    Converted to the validated model with `to_model` when leaving the parser.
+    """
+
+    id: int | None
+    title: str | None
+    price: float | str | None
+    overview_details: str | None = None
+    image_url: str | None = None
+
+    def to_model(self) -> Accommodation:
+        return Accommodation(
+            id=self.id,
+            title=self.title,
+            price=self.price,
+            overview_details=self.overview_details,
+            image_url=self.image_url,  # type: ignore
+        )
+
+
 class SearchResults(BaseModel):
     search_url: HttpUrl
     count: Optional[int]
     accommodations: List[Accommodation]
 
 
+class SearchRecords(NamedTuple):
+    """Compact, unvalidated form of `SearchResults`, holding `AccommodationRecord`s.
+
+    Lets the results be filtered and diffed before validating only the accommodations to notify.
+    """
+
+    search_url: HttpUrl
+    count: Optional[int]
+    records: List[AccommodationRecord]
+
+    def to_model(self) -> SearchResults:
+        return SearchResults(
+            search_url=self.search_url,
+            count=self.count,
+            accommodations=[record.to_model() for record in self.records],
+        )
+
+
 class Notification(BaseModel):
     message: str
+    parse_mode: str = "Markdown"
 
 
 class UserConf(BaseModel):
@@ -26,3 +68,18 @@ class UserConf(BaseModel):
     telegram_id: str
     search_url: HttpUrl
     ignored_ids: List[int] = Field(default_factory=list)
+    check_interval: Optional[float] = None  # seconds, in daemon mode
+
+
+class CachedSession(BaseModel):
+    cookies: List[dict]
+    user_agent: Optional[str] = None
+    rules_validated: bool = False
+    expires_at: datetime
+
+
+class SearchGroup(BaseModel):
+    """Configurations sharing the same search, which is fetched only once for all of them."""
+
+    search_url: HttpUrl
+    user_confs: List[UserConf]
@@ -1,11 +1,82 @@
+import html
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Literal, Mapping, NamedTuple, Tuple, TypeVar
+
 from src.models import Accommodation, Notification, SearchResults
 
+Language = Literal["fr", "en"]
+ParseMode = Literal["Markdown", "HTML"]
+
+K = TypeVar("K", bound=Hashable)
+
+BASE_URL = "https://trouverunlogement.lescrous.fr"
+DEFAULT_TOOL_ID = 36
+
+_TOOL_ID_PATTERN = re.compile(r"/tools/(\d+)/")
+
+
+class MessageTemplates(NamedTuple):
+    no_results: str
+    one_result: str
+    many_results: str
+    accommodation: str
+
+
+TEMPLATES: Dict[Tuple[Language, ParseMode], MessageTemplates] = {
+    ("fr", "Markdown"): MessageTemplates(
+        no_results="Aucun logement trouvé. Voici une liste des ponts de France où vous pourriez dormir : https://fr.wikipedia.org/wiki/Liste_de_ponts_de_France",
+        one_result="Bonne nouvelle 😯, 1 logement est disponible : \n ",
+        many_results="Bonne nouvelle 😯, {count} logements sont disponibles : \n ",
+        accommodation="[*{title}*]({link}) ({price})",
+    ),
+    ("fr", "HTML"): MessageTemplates(
+        no_results="Aucun logement trouvé. Voici une liste des ponts de France où vous pourriez dormir : https://fr.wikipedia.org/wiki/Liste_de_ponts_de_France",
+        one_result="Bonne nouvelle 😯, 1 logement est disponible : \n ",
+        many_results="Bonne nouvelle 😯, {count} logements sont disponibles : \n ",
+        accommodation='<a href="{link}"><b>{title}</b></a> ({price})',
+    ),
+    ("en", "Markdown"): MessageTemplates(
+        no_results="No accommodation found.",
+        one_result="Good news 😯, 1 accommodation is available: \n ",
+        many_results="Good news 😯, {count} accommodations are available: \n ",
+        accommodation="[*{title}*]({link}) ({price})",
+    ),
+    ("en", "HTML"): MessageTemplates(
+        no_results="No accommodation found.",
+        one_result="Good news 😯, 1 accommodation is available: \n ",
+        many_results="Good news 😯, {count} accommodations are available: \n ",
+        accommodation='<a href="{link}"><b>{title}</b></a> ({price})',
+    ),
+}
+
 
 class NotificationBuilder:
-    """Class that builds notifications from search results."""
+    """Class that builds notifications from search results.
+
+    The rendered line of each accommodation is memoized (up to `cache_size` lines,
+    least recently used first evicted), so that search results fanned out to many
+    users are only formatted once.
+    """
 
-    def __init__(self, notify_when_no_results: bool = False):
+    def __init__(
+        self,
+        notify_when_no_results: bool = False,
+        language: Language = "fr",
+        parse_mode: ParseMode = "Markdown",
+        tool_id: int | None = None,
+        cache_size: int = 4096,
+    ):
         self.notify_when_no_results = notify_when_no_results
+        self.parse_mode = parse_mode
+        self.tool_id = tool_id
+        self.cache_size = cache_size
+        self.templates = TEMPLATES[(language, parse_mode)]
+        self._format_accommodation = self.templates.accommodation.format
+        self._format_many_results = self.templates.many_results.format
+        self._lines: OrderedDict[Hashable, str] = OrderedDict()
+        self._lines_lock = threading.Lock()
 
     def search_results_notification(
         self, search_results: SearchResults
@@ -15,25 +86,72 @@ class NotificationBuilder:
             return None
 
         if not accommodations:
-            message = "Aucun logement trouvé. Voici une liste des ponts de France où vous pourriez dormir : https://fr.wikipedia.org/wiki/Liste_de_ponts_de_France"
+            message = self.templates.no_results
+        elif len(accommodations) == 1:
+            message = self.templates.one_result
         else:
-            s = "s" if len(accommodations) > 1 else ""
-            verb = "sont" if len(accommodations) > 1 else "est"
-            message = f"Bonne nouvelle 😯, {len(accommodations)} logement{s} {verb} disponible{s} : \n "
+            message = self._format_many_results(count=len(accommodations))
+
+        tool_id = self.tool_id or _tool_id(str(search_results.search_url))
+        message += "\n\n".join(
+            self._accommodation_line(accommodation, tool_id)
+            for accommodation in accommodations
+        )
+
+        search_url = str(search_results.search_url)
+        if self.parse_mode == "HTML":
+            search_url = html.escape(search_url)
+        message += f"\n\n{search_url}"
+
+        return Notification(message=message, parse_mode=self.parse_mode)
+
+    def search_results_notifications(
+        self, search_results: Mapping[K, SearchResults]
+    ) -> Dict[K, Notification]:
+        """Builds the notifications of many users at once, e.g. from the same search fanned out.
+
+        Users without a notification to send are left out.
+        """
+        notifications = {}
+        for key, results in search_results.items():
+            notification = self.search_results_notification(results)
+            if notification:
+                notifications[key] = notification
+        return notifications
+
+    def _accommodation_line(self, accommodation: Accommodation, tool_id: int) -> str:
+        # Keyed by content too: a line is rendered again when the title or price changes.
+        key = (tool_id, accommodation.id, accommodation.title, accommodation.price)
+        with self._lines_lock:
+            line = self._lines.get(key)
+            if line is not None:
+                self._lines.move_to_end(key)
+                return line
 
-        def format_one_accommodation(accommodation: Accommodation):
-            price = (
-                f"{accommodation.price}€"
-                if isinstance(accommodation.price, float)
-                else accommodation.price
-            )
+        line = self._render_accommodation(accommodation, tool_id)
 
-            link = f"https://trouverunlogement.lescrous.fr/tools/36/accommodations/{accommodation.id}"
+        with self._lines_lock:
+            self._lines[key] = line
+            if len(self._lines) > self.cache_size:
+                self._lines.popitem(last=False)
+        return line
 
-            return f"[*{accommodation.title}*]({link}) ({price})"
+    def _render_accommodation(self, accommodation: Accommodation, tool_id: int) -> str:
+        price = (
+            f"{accommodation.price}€"
+            if isinstance(accommodation.price, float)
+            else accommodation.price
+        )
+        title = accommodation.title
+        link = f"{BASE_URL}/tools/{tool_id}/accommodations/{accommodation.id}"
+        if self.parse_mode == "HTML":
+            title = html.escape(str(title))
+            price = html.escape(str(price))
+            link = html.escape(link)
 
-        message += "\n\n".join(map(format_one_accommodation, accommodations))
+        return self._format_accommodation(title=title, link=link, price=price)
 
-        message += f"\n\n{search_results.search_url}"
 
-        return Notification(message=message)
+def _tool_id(search_url: str) -> int:
+    match = _TOOL_ID_PATTERN.search(search_url)
+    return int(match.group(1)) if match else DEFAULT_TOOL_ID
@@ -1,66 +1,349 @@
+import hashlib
 import logging
-from time import sleep
-from typing import List, Optional
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Container, Dict, Iterator, List, Literal, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 from bs4 import BeautifulSoup
 from pydantic import HttpUrl
-from selenium.webdriver.chrome.webdriver import WebDriver
 
-from src.models import Accommodation, SearchResults
+try:
+    import lxml.etree
+    import lxml.html
+except ImportError:  # lxml is optional, the bs4 backend is used without it
+    lxml = None
+
+from src.fetchers import Fetcher
+from src.metrics import metrics
+from src.models import (
+    Accommodation,
+    AccommodationRecord,
+    SearchRecords,
+    SearchResults,
+)
 from src.settings import Settings
 
 settings = Settings()
 
 logger = logging.getLogger(__name__)
 
+ParserBackend = Literal["bs4", "lxml"]
+
+# Matches elements having the given class among their classes, like bs4's `class_=`.
+_HAS_CLASS = "contains(concat(' ', normalize-space(@class), ' '), ' {} ')"
+_CARDS_XPATH = f"//div[{_HAS_CLASS.format('fr-card')}]"
+_RESULTS_HEADING_XPATH = f"//h2[{_HAS_CLASS.format('SearchResults-desktop')}]"
+_PAGINATION_LINKS_XPATH = f"//a[{_HAS_CLASS.format('fr-pagination__link')}]"
 
-class Parser:
-    """Class to parse the CROUS website and get the available accommodations"""
 
-    def __init__(self, authenticated_driver: WebDriver):
-        self.driver = authenticated_driver
+class Parser:
+    """Class to parse the CROUS website and get the available accommodations
+
+    The "lxml" backend gives the same results as the "bs4" one, much faster. It is
+    used by default when lxml is installed.
+
+    When the results span several pages, the remaining pages are fetched with up to
+    `max_page_workers` concurrent requests.
+
+    Pages whose listing is unchanged since they were last fetched are not parsed again.
+    Cards are parsed into lightweight `AccommodationRecord`s, only validated into
+    `Accommodation` models once all the pages are merged. `get_records` skips the
+    validation altogether, e.g. to diff the results with those already notified.
+    """
+
+    def __init__(
+        self,
+        fetcher: Fetcher,
+        backend: ParserBackend = "lxml",
+        max_page_workers: int = 4,
+    ):
+        if backend == "lxml" and lxml is None:
+            logger.warning(
+                "lxml is not installed, falling back to the bs4 parser backend"
+            )
+            backend = "bs4"
+
+        self.fetcher = fetcher
+        self.backend = backend
+        self.max_page_workers = max_page_workers
+        # (listing digest, parsed page) and search records of the last fetch of each URL
+        self._page_cache: Dict[
+            str, Tuple[bytes, Tuple[Optional[int], List[AccommodationRecord], int]]
+        ] = {}
+        self._records_cache: Dict[str, SearchRecords] = {}
+        # Search results validated from the search records of each URL
+        self._results_cache: Dict[str, Tuple[SearchRecords, SearchResults]] = {}
+        self._cache_lock = threading.Lock()
 
     def get_accommodations(self, search_url: HttpUrl) -> SearchResults:
-        """Returns the accommodations found on the CROUS website for the given search URL"""
+        """Returns the accommodations found on the CROUS website for the given search URL
+
+        When no result page changed since the previous call, the very same
+        `SearchResults` object is returned, so callers can skip unchanged results
+        with an identity check.
+        """
+        search_records = self.get_records(search_url)
+        with self._cache_lock:
+            cached = self._results_cache.get(str(search_url))
+            if cached and cached[0] is search_records:
+                return cached[1]
+
+        search_results = search_records.to_model()
+        with self._cache_lock:
+            self._results_cache[str(search_url)] = (search_records, search_results)
+        return search_results
+
+    def get_records(self, search_url: HttpUrl) -> SearchRecords:
+        """Like `get_accommodations`, but returns the compact records, not validated into models.
+
+        When no result page changed since the previous call, the very same
+        `SearchRecords` object is returned.
+        """
         logger.info(f"Getting accommodations from the search URL: {search_url}")
-        self.driver.get(str(search_url))
-        sleep(2)
-        html = self.driver.page_source
-        search_results_soup = BeautifulSoup(html, "html.parser")
-        num_accommodations = self._get_accomodations_count(search_results_soup)
+        num_accommodations, records, last_page, unchanged = self._get_page(
+            str(search_url)
+        )
         logger.info(f"Found {num_accommodations} accommodations")
 
-        return SearchResults(
-            search_url=search_url,
-            count=num_accommodations,
-            accommodations=parse_accommodations_summaries(search_results_soup),
-        )
+        if last_page > 1 and (
+            num_accommodations is None or len(records) < num_accommodations
+        ):
+            records, other_pages_unchanged = self._get_all_pages(
+                str(search_url), records, last_page, num_accommodations
+            )
+            unchanged = unchanged and other_pages_unchanged
+            num_accommodations = len(records)
+        elif num_accommodations is not None and len(records) < num_accommodations:
+            logger.warning(
+                f"The search reports {num_accommodations} accommodations but only "
+                f"{len(records)} were found, without pagination links"
+            )
+            num_accommodations = len(records)
+
+        with self._cache_lock:
+            previous_records = self._records_cache.get(str(search_url))
+            if unchanged and previous_records is not None:
+                logger.info("The search results did not change")
+                return previous_records
+
+            search_records = SearchRecords(search_url, num_accommodations, records)
+            self._records_cache[str(search_url)] = search_records
+        return search_records
+
+    def iter_accommodations(
+        self,
+        search_url: HttpUrl,
+        limit: Optional[int] = None,
+        stop_ids: Container[int] = (),
+    ) -> Iterator[Accommodation]:
+        """Yields the accommodations found for the given search URL one by one, see `iter_accommodations`."""
+        logger.info(f"Streaming accommodations from the search URL: {search_url}")
+        html = self.fetcher.fetch(str(search_url))
+        yield from iter_accommodations(html, self.backend, limit, stop_ids)
+
+    def _get_page(
+        self, url: str
+    ) -> Tuple[Optional[int], List[AccommodationRecord], int, bool]:
+        """Returns the accommodations count, the accommodations and the number of pages of a results page.
+
+        The last value tells whether the listing is unchanged since the page was last
+        fetched, in which case the page isn't parsed again.
+        """
+        html = self.fetcher.fetch(url)
+
+        digest = _listing_digest(html)
+        with self._cache_lock:
+            cached = self._page_cache.get(url)
+        if cached and cached[0] == digest:
+            metrics.inc("pages_unchanged_total")
+            return (*cached[1], True)
+
+        with metrics.timer("parse"):
+            if self.backend == "lxml":
+                tree = _parse_html_lxml(html)
+                page = (
+                    _get_accommodations_count_lxml(tree),
+                    _parse_records_lxml(tree),
+                    _get_last_page_lxml(tree),
+                )
+            else:
+                search_results_soup = BeautifulSoup(html, "html.parser")
+                page = (
+                    self._get_accomodations_count(search_results_soup),
+                    _parse_records(search_results_soup),
+                    _get_last_page(search_results_soup),
+                )
+
+        metrics.inc("cards_parsed_total", len(page[1]))
+        with self._cache_lock:
+            self._page_cache[url] = (digest, page)
+        return (*page, False)
+
+    def _get_all_pages(
+        self,
+        search_url: str,
+        first_page: List[AccommodationRecord],
+        last_page: int,
+        expected_count: Optional[int],
+    ) -> Tuple[List[AccommodationRecord], bool]:
+        """Fetches the pages 2 to `last_page` concurrently and merges them with the first one, without duplicates.
+
+        No more pages are requested once `expected_count` distinct accommodations are collected.
+        Also returns whether all the fetched pages were unchanged. With `max_page_workers`
+        set to 1, the pages are fetched one after the other in the calling thread.
+        """
+        logger.info(f"Fetching up to {last_page - 1} more result pages")
+        pages: Dict[int, List[AccommodationRecord]] = {1: first_page}
+        collected_ids = {accommodation.id for accommodation in first_page}
+        remaining_pages = iter(range(2, last_page + 1))
+        all_unchanged = True
+
+        if self.max_page_workers <= 1:
+            for page in remaining_pages:
+                if expected_count is not None and len(collected_ids) >= expected_count:
+                    break
+                _, accommodations, _, unchanged = self._get_page(
+                    _page_url(search_url, page)
+                )
+                all_unchanged = all_unchanged and unchanged
+                pages[page] = accommodations
+                collected_ids.update(
+                    accommodation.id for accommodation in accommodations
+                )
+
+            logger.info(f"Fetched {len(pages)} result pages")
+            return _merge_pages(pages), all_unchanged
+
+        with ThreadPoolExecutor(self.max_page_workers) as executor:
+            in_flight: Dict[Future, int] = {}
+
+            def submit_next_page() -> None:
+                page = next(remaining_pages, None)
+                if page is not None:
+                    future = executor.submit(
+                        self._get_page, _page_url(search_url, page)
+                    )
+                    in_flight[future] = page
+
+            for _ in range(self.max_page_workers):
+                submit_next_page()
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _, accommodations, _, unchanged = future.result()
+                    all_unchanged = all_unchanged and unchanged
+                    pages[in_flight.pop(future)] = accommodations
+                    collected_ids.update(
+                        accommodation.id for accommodation in accommodations
+                    )
+
+                if expected_count is not None and len(collected_ids) >= expected_count:
+                    continue  # enough: let the pages in flight finish, but request no more
+                for _ in done:
+                    submit_next_page()
+
+        logger.info(f"Fetched {len(pages)} result pages")
+        return _merge_pages(pages), all_unchanged
 
     def _get_accomodations_count(
         self, search_results_soup: BeautifulSoup
     ) -> Optional[int]:
-        results_heading = search_results_soup.find(
-            "h2", class_="SearchResults-desktop fr-h4 svelte-11sc5my"
-        )
+        results_heading = search_results_soup.find("h2", class_="SearchResults-desktop")
 
         if not results_heading:
             return None
 
-        number_or_aucun = results_heading.text.split()[0]
+        return _parse_accommodations_count(results_heading.text)
 
-        if number_or_aucun == "Aucun":
-            return 0
 
-        try:
-            number = int(number_or_aucun)
-            return number
-        except ValueError:
-            return None
+def _parse_accommodations_count(results_heading_text: str) -> Optional[int]:
+    words = results_heading_text.split()
+    if not words:
+        return None
+
+    number_or_aucun = words[0]
+
+    if number_or_aucun == "Aucun":
+        return 0
+
+    try:
+        number = int(number_or_aucun)
+        return number
+    except ValueError:
+        return None
+
+
+def _get_last_page(search_results_soup: BeautifulSoup) -> int:
+    return _parse_last_page(
+        (link.text, link.get("href"))
+        for link in search_results_soup.find_all("a", class_="fr-pagination__link")
+    )
+
+
+def _parse_last_page(pagination_links) -> int:
+    """Returns the highest page number among the (text, href) of the pagination links, 1 if there are none."""
+    last_page = 1
+    for text, href in pagination_links:
+        candidates = [text.strip()]
+        if href:
+            candidates += [
+                value for key, value in parse_qsl(urlsplit(href).query) if key == "page"
+            ]
+        for candidate in candidates:
+            if candidate.isdigit():
+                last_page = max(last_page, int(candidate))
+    return last_page
+
+
+def _listing_region(html: str) -> str:
+    """Returns the part of a results page listing the accommodations, from the results heading
+    (or the first card) to the end of the main content.
+
+    Ignoring the rest of the page keeps per-request tokens, e.g. in the head, from
+    making an unchanged listing look changed.
+    """
+    start = html.find("SearchResults-desktop")
+    if start == -1:
+        start = html.find("fr-card")
+    if start == -1:
+        return html
+
+    end = html.find("</main>", start)
+    return html[start:end] if end != -1 else html[start:]
+
+
+def _listing_digest(html: str) -> bytes:
+    return hashlib.blake2b(_listing_region(html).encode(), digest_size=16).digest()
+
+
+def _page_url(search_url: str, page: int) -> str:
+    parts = urlsplit(search_url)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key != "page"]
+    query.append(("page", str(page)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _merge_pages(
+    pages: Dict[int, List[AccommodationRecord]],
+) -> List[AccommodationRecord]:
+    """Concatenates the pages in order, dropping accommodations already seen on a previous page."""
+    merged: List[AccommodationRecord] = []
+    seen_ids = set()
+    for page in sorted(pages):
+        for accommodation in pages[page]:
+            if accommodation.id is not None and accommodation.id in seen_ids:
+                continue
+            seen_ids.add(accommodation.id)
+            merged.append(accommodation)
+    return merged
 
 
 def _try_parse_url(title_card) -> HttpUrl | None:
     try:
         return title_card.find("a")["href"]
     except Exception:
+        metrics.inc("parse_failures_total", field="url")
         return None
 
 
@@ -71,6 +354,7 @@ def _try_parse_id(url: str | None) -> int | None:
     try:
         return int(url.split("/")[-1])
     except Exception:
+        metrics.inc("parse_failures_total", field="id")
         return None
 
 
@@ -80,28 +364,42 @@ def _try_parse_image_url(image):
     try:
         return image["src"]
     except Exception:
+        metrics.inc("parse_failures_total", field="image_url")
         return None
 
 
 def _try_parse_price(price) -> float | str | None:
     if not price:
         return None
+    return _try_parse_price_text(price.text)
+
+
+def _try_parse_price_text(price_text: str) -> float | str:
     try:
-        return float(price.text.strip().strip("€").strip().replace(",", "."))
+        return float(price_text.strip().strip("€").strip().replace(",", "."))
     except Exception:
-        pass
+        # Price ranges such as "de 418,4 à 481,2 €" are valid, and kept as text
+        if price_text.strip():
+            metrics.inc("prices_unparsed_total")
+        else:
+            metrics.inc("parse_failures_total", field="price")
 
-    return price.text.strip()
+    return price_text.strip()
 
 
 def parse_accommodation_card(card: BeautifulSoup) -> Accommodation | None:
+    record = _parse_card_record(card)
+    return record.to_model() if record else None
+
+
+def _parse_card_record(card: BeautifulSoup) -> AccommodationRecord | None:
     title_card = card.find("h3", class_="fr-card__title")
     if not title_card:
         return None
 
     title = title_card.text.strip()
     url = _try_parse_url(title_card)
-    accommodation_id = _try_parse_id(str(url))
+    accommodation_id = _try_parse_id(str(url) if url is not None else None)
 
     image = card.find("img", class_="fr-responsive-img")
     image_url = _try_parse_image_url(image)
@@ -122,10 +420,10 @@ def parse_accommodation_card(card: BeautifulSoup) -> Accommodation | None:
 
     price = _try_parse_price(price)
 
-    return Accommodation(
+    return AccommodationRecord(
         id=accommodation_id,
         title=title,
-        image_url=image_url,  # type: ignore
+        image_url=image_url,
         price=price,
         overview_details="\n".join(overview_details),
     )
@@ -134,12 +432,172 @@ def parse_accommodation_card(card: BeautifulSoup) -> Accommodation | None:
 def parse_accommodations_summaries(
     search_results_soup: BeautifulSoup,
 ) -> List[Accommodation]:
+    return [record.to_model() for record in _parse_records(search_results_soup)]
+
+
+def _parse_records(search_results_soup: BeautifulSoup) -> List[AccommodationRecord]:
     cards = search_results_soup.find_all("div", class_="fr-card")
 
-    accommodations: List[Accommodation] = []
+    records: List[AccommodationRecord] = []
     for card in cards:
-        accommodation = parse_accommodation_card(card)
+        record = _parse_card_record(card)
+        if record:
+            records.append(record)
+
+    return records
+
+
+def _parse_html_lxml(html: str):
+    if not html.strip():
+        return lxml.html.fromstring("<html></html>")
+    return lxml.html.fromstring(html)
+
+
+def _get_accommodations_count_lxml(tree) -> Optional[int]:
+    results_headings = tree.xpath(_RESULTS_HEADING_XPATH)
+    if not results_headings:
+        return None
+
+    return _parse_accommodations_count(results_headings[0].text_content())
+
+
+def _get_last_page_lxml(tree) -> int:
+    return _parse_last_page(
+        (link.text_content(), link.get("href"))
+        for link in tree.xpath(_PAGINATION_LINKS_XPATH)
+    )
+
+
+def parse_accommodation_card_lxml(card) -> Accommodation | None:
+    """Same as `parse_accommodation_card` for an lxml element, in a single pass over the card."""
+    record = _parse_card_record_lxml(card)
+    return record.to_model() if record else None
+
+
+def _parse_card_record_lxml(card) -> AccommodationRecord | None:
+    title_card = image = address = price = None
+    details = []
+
+    for element in card.iter("h3", "img", "p"):
+        classes = element.get("class", "").split()
+        if element.tag == "h3":
+            if title_card is None and "fr-card__title" in classes:
+                title_card = element
+        elif element.tag == "img":
+            if image is None and "fr-responsive-img" in classes:
+                image = element
+        else:
+            if address is None and "fr-card__desc" in classes:
+                address = element
+            if "fr-card__detail" in classes:
+                details.append(element)
+            if price is None and "fr-badge" in classes:
+                price = element
+
+    if title_card is None:
+        return None
+
+    link = next(title_card.iter("a"), None)
+    url = link.get("href") if link is not None else None
+    # Counted like the failures of `_try_parse_url` and `_try_parse_image_url`
+    if url is None:
+        metrics.inc("parse_failures_total", field="url")
+
+    image_url = image.get("src") if image is not None else None
+    if image is not None and image_url is None:
+        metrics.inc("parse_failures_total", field="image_url")
+
+    overview_details = []
+    if address is not None:
+        overview_details.append(address.text_content().strip())
+    for detail in details:
+        overview_details.append(detail.text_content().strip())
+
+    return AccommodationRecord(
+        id=_try_parse_id(str(url) if url is not None else None),
+        title=title_card.text_content().strip(),
+        image_url=image_url,
+        price=_try_parse_price_text(price.text_content())
+        if price is not None
+        else None,
+        overview_details="\n".join(overview_details),
+    )
+
+
+def parse_accommodations_summaries_lxml(tree) -> List[Accommodation]:
+    return [record.to_model() for record in _parse_records_lxml(tree)]
+
+
+def _parse_records_lxml(tree) -> List[AccommodationRecord]:
+    records: List[AccommodationRecord] = []
+    for card in tree.xpath(_CARDS_XPATH):
+        record = _parse_card_record_lxml(card)
+        if record:
+            records.append(record)
+
+    return records
+
+
+# Size of the slices of the page fed to the streaming lxml parser.
+_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _iter_accommodations_lxml(html: str) -> Iterator[Accommodation]:
+    parser = lxml.etree.HTMLPullParser(events=("end",), tag="div")
+    parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+    for start in range(0, len(html), _STREAM_CHUNK_SIZE):
+        parser.feed(html[start : start + _STREAM_CHUNK_SIZE])
+        yield from _parse_card_events(parser.read_events())
+
+    # Closing the parser ends the elements left open, e.g. an unclosed last card.
+    parser.close()
+    yield from _parse_card_events(parser.read_events())
+
+
+def _parse_card_events(events) -> Iterator[Accommodation]:
+    for _, element in events:
+        if "fr-card" not in element.get("class", "").split():
+            continue
+
+        accommodation = parse_accommodation_card_lxml(element)
+
+        # Drop the cards already parsed so that memory stays flat on large pages.
+        element.clear()
+        for ancestor in element.iterancestors():
+            while ancestor.getprevious() is not None:
+                del ancestor.getparent()[0]
+
         if accommodation:
-            accommodations.append(accommodation)
+            yield accommodation
 
-    return accommodations
+
+def _iter_accommodations_bs4(html: str) -> Iterator[Accommodation]:
+    for card in BeautifulSoup(html, "html.parser").find_all("div", class_="fr-card"):
+        accommodation = parse_accommodation_card(card)
+        if accommodation:
+            yield accommodation
+
+
+def iter_accommodations(
+    html: str,
+    backend: ParserBackend = "lxml",
+    limit: Optional[int] = None,
+    stop_ids: Container[int] = (),
+) -> Iterator[Accommodation]:
+    """Yields the accommodations of a search results page card by card.
+
+    With the lxml backend, the page is parsed incrementally and the cards already
+    yielded are discarded. Iteration stops after `limit` accommodations, or on the
+    first accommodation whose id is in `stop_ids` (e.g. already seen ones).
+    """
+    if backend == "lxml" and lxml is not None:
+        accommodations = _iter_accommodations_lxml(html)
+    else:
+        accommodations = _iter_accommodations_bs4(html)
+
+    for count, accommodation in enumerate(accommodations):
+        if limit is not None and count >= limit:
+            return
+        if accommodation.id in stop_ids:
+            return
+        yield accommodation
@@ -0,0 +1,60 @@
+from typing import Dict, List
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from src.models import SearchGroup, SearchRecords, SearchResults, UserConf
+
+
+def normalize_search_url(url: str) -> str:
+    """Returns a canonical form of the search URL, so that equivalent searches compare equal.
+
+    The scheme and host are lowercased, query parameters sorted, empty ones and the fragment dropped.
+    """
+    parts = urlsplit(url)
+    query = sorted(parse_qsl(parts.query))
+    return urlunsplit(
+        (
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            parts.path.rstrip("/") or "/",
+            urlencode(query),
+            "",
+        )
+    )
+
+
+def plan_searches(user_confs: List[UserConf]) -> List[SearchGroup]:
+    """Groups the configurations by search, so that each distinct search is fetched once."""
+    groups: Dict[str, List[UserConf]] = {}
+    for conf in user_confs:
+        groups.setdefault(normalize_search_url(str(conf.search_url)), []).append(conf)
+
+    return [
+        SearchGroup(search_url=search_url, user_confs=confs)  # type: ignore
+        for search_url, confs in groups.items()
+    ]
+
+
+def results_for_conf(search_results: SearchResults, conf: UserConf) -> SearchResults:
+    """Returns the shared search results as seen by one configuration, without its ignored accommodations."""
+    ignored_ids = set(conf.ignored_ids)
+    return search_results.model_copy(
+        update={
+            "search_url": conf.search_url,
+            "accommodations": [
+                accommodation
+                for accommodation in search_results.accommodations
+                if accommodation.id not in ignored_ids
+            ],
+        }
+    )
+
+
+def records_for_conf(search_records: SearchRecords, conf: UserConf) -> SearchRecords:
+    """Like `results_for_conf`, for compact search records."""
+    ignored_ids = set(conf.ignored_ids)
+    return search_records._replace(
+        search_url=conf.search_url,
+        records=[
+            record for record in search_records.records if record.id not in ignored_ids
+        ],
+    )
@@ -0,0 +1,36 @@
+import threading
+from time import monotonic, sleep
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter.
+
+    Allows `rate` acquisitions per second on average, with bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Takes a token if one is available and returns 0, otherwise returns how long to wait for one."""
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self) -> None:
+        """Blocks until a token is available, and takes it."""
+        while wait := self.try_acquire():
+            sleep(wait)
@@ -0,0 +1,171 @@
+import logging
+import sqlite3
+import threading
+from datetime import timedelta
+from pathlib import Path
+from time import time
+from typing import List, Sequence, TypeVar
+
+from src.models import Accommodation, AccommodationRecord, UserConf
+from src.planner import normalize_search_url
+
+logger = logging.getLogger(__name__)
+
+# Either form of an accommodation, both having an id and a price
+A = TypeVar("A", Accommodation, AccommodationRecord)
+
+# Stored price of an accommodation never seen before: differs from any real price, even None.
+_UNSEEN = object()
+
+# Stays below SQLITE_MAX_VARIABLE_NUMBER, which is 999 before SQLite 3.32.
+_MAX_IDS_PER_QUERY = 500
+
+
+def conf_key(conf: UserConf) -> str:
+    """Identifies a configuration in the store: same user and same search."""
+    return f"{conf.telegram_id}:{normalize_search_url(str(conf.search_url))}"
+
+
+class SeenStore:
+    """SQLite store of the accommodations already notified to each configuration.
+
+    It records when each accommodation was first and last seen, and at which price,
+    so that only new or changed listings are notified. Entries not seen for longer
+    than `ttl` are evicted, so a listing coming back after that is notified again.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        ttl: timedelta = timedelta(days=30),
+        eviction_interval: timedelta = timedelta(minutes=10),
+    ):
+        self.ttl = ttl
+        self.eviction_interval = eviction_interval
+        self._last_eviction = 0.0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS seen_accommodations (
+                conf_key TEXT NOT NULL,
+                accommodation_id INTEGER NOT NULL,
+                price TEXT,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY (conf_key, accommodation_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS seen_accommodations_last_seen
+                ON seen_accommodations (last_seen);
+            """
+        )
+
+    def new_or_changed(self, conf: UserConf, accommodations: Sequence[A]) -> List[A]:
+        """Returns the given accommodations that are new or whose price changed, without recording them.
+
+        Accommodations without an id can't be tracked, and are always returned.
+        """
+        key = conf_key(conf)
+        ids = [
+            accommodation.id
+            for accommodation in accommodations
+            if accommodation.id is not None
+        ]
+
+        with self._lock, self._connection:
+            self._evict_expired_if_due(time())
+
+            # Primary key lookups of the current batch only, whatever the size of the history.
+            known_prices = {}
+            for i in range(0, len(ids), _MAX_IDS_PER_QUERY):
+                chunk = ids[i : i + _MAX_IDS_PER_QUERY]
+                known_prices.update(
+                    self._connection.execute(
+                        f"""
+                        SELECT accommodation_id, price FROM seen_accommodations
+                        WHERE conf_key = ? AND accommodation_id IN ({", ".join("?" * len(chunk))})
+                        """,
+                        (key, *chunk),
+                    )
+                )
+
+        new_or_changed = [
+            accommodation
+            for accommodation in accommodations
+            if accommodation.id is None
+            or known_prices.get(accommodation.id, _UNSEEN) != _price_key(accommodation)
+        ]
+        logger.info(
+            f"{len(new_or_changed)} new or changed accommodations out of {len(accommodations)}"
+        )
+        return new_or_changed
+
+    def mark_seen(
+        self,
+        conf: UserConf,
+        accommodations: Sequence[Accommodation | AccommodationRecord],
+    ) -> None:
+        """Records the given accommodations as seen by the configuration, at their current price.
+
+        Call it once they were notified, so that a failed notification is retried on the next check.
+        """
+        key = conf_key(conf)
+        now = time()
+
+        with self._lock, self._connection:
+            self._connection.executemany(
+                """
+                INSERT INTO seen_accommodations (conf_key, accommodation_id, price, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (conf_key, accommodation_id)
+                DO UPDATE SET price = excluded.price, last_seen = excluded.last_seen
+                """,
+                [
+                    (key, accommodation.id, _price_key(accommodation), now, now)
+                    for accommodation in accommodations
+                    if accommodation.id is not None
+                ],
+            )
+
+    def refresh_last_seen(self, confs: List[UserConf], ids: List[int]) -> None:
+        """Records that the already seen accommodations with the given ids are still listed, so they are not evicted."""
+        keys = [conf_key(conf) for conf in confs]
+        now = time()
+
+        with self._lock, self._connection:
+            for i in range(0, len(ids), _MAX_IDS_PER_QUERY):
+                chunk = ids[i : i + _MAX_IDS_PER_QUERY]
+                self._connection.execute(
+                    f"""
+                    UPDATE seen_accommodations SET last_seen = ?
+                    WHERE conf_key IN ({", ".join("?" * len(keys))})
+                    AND accommodation_id IN ({", ".join("?" * len(chunk))})
+                    """,
+                    (now, *keys, *chunk),
+                )
+
+    def evict_expired(self) -> int:
+        """Removes the entries not seen for longer than the TTL, and returns how many were removed."""
+        with self._lock, self._connection:
+            return self._evict_expired(time())
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _evict_expired_if_due(self, now: float) -> None:
+        if now - self._last_eviction >= self.eviction_interval.total_seconds():
+            self._evict_expired(now)
+
+    def _evict_expired(self, now: float) -> int:
+        self._last_eviction = now
+        cursor = self._connection.execute(
+            "DELETE FROM seen_accommodations WHERE last_seen < ?",
+            (now - self.ttl.total_seconds(),),
+        )
+        if cursor.rowcount:
+            logger.info(f"Evicted {cursor.rowcount} expired seen accommodations")
+        return cursor.rowcount
+
+
+def _price_key(accommodation: Accommodation | AccommodationRecord) -> str | None:
+    return None if accommodation.price is None else str(accommodation.price)
@@ -0,0 +1,66 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from src.models import CachedSession
+
+logger = logging.getLogger(__name__)
+
+
+class SessionCache:
+    """Stores the authenticated cookie jar on disk so that warm starts can skip the login."""
+
+    def __init__(self, path: str | Path, ttl: timedelta = timedelta(hours=2)):
+        self.path = Path(path)
+        self.ttl = ttl
+
+    def load(self) -> CachedSession | None:
+        """Returns the cached session, or None if there is none or it has expired."""
+        if not self.path.exists():
+            return None
+
+        try:
+            cached = CachedSession.model_validate_json(self.path.read_text())
+        except (OSError, ValidationError) as e:
+            logger.warning(f"Ignoring unreadable session cache {self.path}: {e}")
+            return None
+
+        if cached.expires_at <= datetime.now(timezone.utc):
+            logger.info("Cached session has expired")
+            return None
+
+        return cached
+
+    def save(
+        self,
+        cookies: list[dict],
+        user_agent: str | None = None,
+        rules_validated: bool = False,
+    ) -> CachedSession:
+        """Saves the given cookies. The session expires after the TTL, or earlier if a cookie does."""
+        expires_at = datetime.now(timezone.utc) + self.ttl
+        for cookie in cookies:
+            if "expiry" in cookie:
+                cookie_expiry = datetime.fromtimestamp(cookie["expiry"], timezone.utc)
+                expires_at = min(expires_at, cookie_expiry)
+
+        cached = CachedSession(
+            cookies=cookies,
+            user_agent=user_agent,
+            rules_validated=rules_validated,
+            expires_at=expires_at,
+        )
+
+        # The cookies grant access to the account: keep the file private.
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(cached.model_dump_json())
+
+        logger.info(f"Saved session to {self.path}, valid until {expires_at}")
+        return cached
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
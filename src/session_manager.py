@@ -0,0 +1,129 @@
+import logging
+from typing import Callable, Literal, Sequence
+
+from selenium.webdriver.chrome.webdriver import WebDriver
+
+from src.authenticator import Authenticator
+from src.browser_pool import BrowserPool
+from src.fetchers import Fetcher, HttpFetcher
+from src.models import CachedSession
+from src.rate_limiter import TokenBucket
+from src.session_cache import SessionCache
+from src.settings import Settings
+
+settings = Settings()
+
+logger = logging.getLogger(__name__)
+
+Engine = Literal["selenium", "http"]
+
+
+class SessionManager:
+    """Provides an authenticated Fetcher, reusing the cached session when the website still accepts it.
+
+    A full login through the `Authenticator` only happens when there is no cached session,
+    or when the cached one is rejected.
+
+    With the "selenium" engine, pages are fetched by a `BrowserPool` of up to
+    `browser_pool_size` browsers sharing the session, which checks their health
+    and recycles them, even when there is a single one.
+    """
+
+    def __init__(
+        self,
+        authenticator: Authenticator,
+        driver_factory: Callable[[], WebDriver],
+        engine: Engine = "selenium",
+        cache: SessionCache | None = None,
+        rate_limiter: TokenBucket | None = None,
+        browser_pool_size: int = 1,
+        browser_max_uses: int = 100,
+        browser_max_memory_growth: int = 200 * 1024 * 1024,
+    ):
+        self.authenticator = authenticator
+        self.driver_factory = driver_factory
+        self.engine = engine
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.browser_pool_size = browser_pool_size
+        self.browser_max_uses = browser_max_uses
+        self.browser_max_memory_growth = browser_max_memory_growth
+        self.browser_pool: BrowserPool | None = None
+
+    def get_fetcher(self) -> Fetcher:
+        cached = self._load_valid_session()
+        if cached:
+            logger.info("Reusing the cached session")
+            return self._fetcher_from_session(cached)
+
+        return self._login()
+
+    def refresh(self) -> Fetcher:
+        """Logs in again, discarding the current session. To be called when it has expired."""
+        logger.info("Refreshing the session")
+        self.close()
+        if self.cache:
+            self.cache.clear()
+        return self._login()
+
+    def close(self) -> None:
+        if self.browser_pool:
+            self.browser_pool.close()
+            self.browser_pool = None
+
+    def _load_valid_session(self) -> CachedSession | None:
+        if not self.cache:
+            return None
+
+        cached = self.cache.load()
+        if not cached or not cached.rules_validated:
+            return None
+
+        fetcher = HttpFetcher.from_cookies(cached.cookies, cached.user_agent)
+        if not fetcher.is_authenticated(settings.SESSION_CHECK_URL):
+            logger.info("The cached session was rejected, logging in again")
+            self.cache.clear()
+            return None
+
+        return cached
+
+    def _fetcher_from_session(self, cached: CachedSession) -> Fetcher:
+        if self.engine == "http":
+            return HttpFetcher.from_cookies(
+                cached.cookies, cached.user_agent, rate_limiter=self.rate_limiter
+            )
+
+        return self._start_browser_pool(cached.cookies)
+
+    def _login(self) -> Fetcher:
+        driver = self.driver_factory()
+        self.authenticator.authenticate_driver(driver)
+
+        if self.cache:
+            self.cache.save(
+                driver.get_cookies(),
+                user_agent=driver.execute_script("return navigator.userAgent"),
+                rules_validated=True,
+            )
+
+        if self.engine == "http":
+            fetcher = HttpFetcher.from_driver(driver, rate_limiter=self.rate_limiter)
+            driver.quit()  # the browser is no longer needed once cookies are exported
+            return fetcher
+
+        return self._start_browser_pool(driver.get_cookies(), drivers=[driver])
+
+    def _start_browser_pool(
+        self, cookies: list[dict], drivers: Sequence[WebDriver] = ()
+    ) -> BrowserPool:
+        self.browser_pool = BrowserPool(
+            self.driver_factory,
+            cookies,
+            size=self.browser_pool_size,
+            max_uses=self.browser_max_uses,
+            max_memory_growth=self.browser_max_memory_growth,
+            timeout=settings.WAIT_TIMEOUT_SECONDS,
+            drivers=drivers,
+        )
+        self.browser_pool.warm_up()
+        return self.browser_pool
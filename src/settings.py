@@ -1,5 +1,7 @@
 # pydantic-settings class
 
+from typing import List, Literal, Optional
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -19,3 +21,40 @@ class Settings(BaseSettings):
 
     TELEGRAM_BOT_TOKEN: str = Field(default=...)
     MY_TELEGRAM_ID: str = Field(default=...)
+
+    # JSON Lines file or SQLite database (.sqlite3) of the users configurations.
+    # Without it, MY_TELEGRAM_ID is notified of the accommodations of DEFAULT_SEARCH_URL,
+    # except those in DEFAULT_IGNORED_IDS.
+    USERS_CONF_PATH: Optional[str] = None
+    USERS_CONF_RELOAD_INTERVAL_SECONDS: float = 30
+    DEFAULT_SEARCH_URL: str = "https://trouverunlogement.lescrous.fr/tools/36/search?bounds=4.863088128353419_45.79119771932692_4.887077805782618_45.764140033383086"
+    DEFAULT_IGNORED_IDS: List[int] = [2755]
+
+    CROUS_BASE_URL: str = "https://trouverunlogement.lescrous.fr"
+    SESSION_CHECK_URL: str = "https://trouverunlogement.lescrous.fr/tools/36/search"
+    SESSION_CACHE_PATH: str = ".session_cache.json"
+    SESSION_CACHE_TTL_SECONDS: int = 2 * 60 * 60
+    WAIT_TIMEOUT_SECONDS: float = 10
+
+    DAEMON_INTERVAL_SECONDS: float = 5 * 60
+    DAEMON_JITTER: float = 0.1
+
+    MAX_WORKERS: int = 4
+    MAX_REQUESTS_PER_SECOND: float = 2
+
+    # Browsers fetching pages concurrently with the selenium engine, recycled after
+    # BROWSER_MAX_USES pages or once their JavaScript heap grew by BROWSER_MAX_MEMORY_GROWTH_MB
+    BROWSER_POOL_SIZE: int = 1
+    BROWSER_MAX_USES: int = 100
+    BROWSER_MAX_MEMORY_GROWTH_MB: float = 200
+
+    SEEN_STORE_PATH: str = "seen_accommodations.sqlite3"
+    SEEN_TTL_DAYS: float = 30
+
+    NOTIFICATION_LANGUAGE: Literal["fr", "en"] = "fr"
+    NOTIFICATION_PARSE_MODE: Literal["Markdown", "HTML"] = "Markdown"
+    TELEGRAM_MAX_MESSAGES_PER_SECOND: float = 25
+    TELEGRAM_MAX_MESSAGES_PER_CHAT_PER_SECOND: float = 1
+
+    # Port serving the metrics on /metrics (Prometheus) and /metrics.json, disabled when unset
+    METRICS_PORT: Optional[int] = None
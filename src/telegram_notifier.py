@@ -1,6 +1,31 @@
+from typing import Callable, List
+
+from src.metrics import metrics
 from src.models import Notification
 from telepot import Bot  # type: ignore
 
+# Maximum length of a Telegram message
+MAX_MESSAGE_LENGTH = 4096
+
+
+def split_message(message: str, max_length: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """Splits a message into chunks Telegram accepts.
+
+    Splits preferably between paragraphs, so that a formatted accommodation line is
+    never cut, then between lines, and only cuts inside a line as a last resort.
+    """
+    if len(message) <= max_length:
+        return [message]
+
+    for separator in ("\n\n", "\n"):
+        cut = message.rfind(separator, 0, max_length)
+        if cut > 0:
+            return [message[:cut]] + split_message(
+                message[cut + len(separator) :], max_length
+            )
+
+    return [message[:max_length]] + split_message(message[max_length:], max_length)
+
 
 class TelegramNotifier:
     """Class that sends notifications to a Telegram user."""
@@ -9,6 +34,30 @@ class TelegramNotifier:
         self.bot = bot
 
     def send_notification(
-        self, telegramId: str, notification: Notification, parse_mode: str = "Markdown"
+        self,
+        telegramId: str,
+        notification: Notification,
+        parse_mode: str | None = None,
+        on_sent: Callable[[], None] | None = None,
+    ) -> None:
+        """Sends the notification, calling `on_sent` once it was delivered."""
+        try:
+            for message in split_message(notification.message):
+                self.send_message(
+                    telegramId,
+                    message,
+                    parse_mode=parse_mode or notification.parse_mode,
+                )
+        except Exception:
+            metrics.inc("notifications_failed_total")
+            raise
+        metrics.inc("notifications_sent_total")
+        if on_sent:
+            on_sent()
+
+    def send_message(
+        self, telegramId: str, message: str, parse_mode: str = "Markdown"
     ) -> None:
-        self.bot.sendMessage(telegramId, notification.message, parse_mode=parse_mode)
+        """Sends a single message, that must not exceed MAX_MESSAGE_LENGTH."""
+        with metrics.timer("telegram_send"):
+            self.bot.sendMessage(telegramId, message, parse_mode=parse_mode)
@@ -0,0 +1,195 @@
+import logging
+import sqlite3
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+from pydantic import ValidationError
+
+from src.models import UserConf
+from src.planner import normalize_search_url
+
+logger = logging.getLogger(__name__)
+
+
+class UserConfStore(ABC):
+    """Users configurations, indexed by telegram id and by search URL.
+
+    Subclasses load them from a source, and `reload_if_changed` cheaply checks the
+    source and only validates the configurations that changed since the last load.
+    A load that fails is attempted again on the next call.
+    """
+
+    def __init__(self):
+        self._user_confs: List[UserConf] = []
+        self._by_telegram_id: Dict[str, List[UserConf]] = {}
+        self._by_search_url: Dict[str, List[UserConf]] = {}
+
+    def user_confs(self) -> List[UserConf]:
+        return self._user_confs
+
+    def get_by_telegram_id(self, telegram_id: str) -> List[UserConf]:
+        return self._by_telegram_id.get(telegram_id, [])
+
+    def get_by_search_url(self, search_url: str) -> List[UserConf]:
+        return self._by_search_url.get(normalize_search_url(search_url), [])
+
+    def reload_if_changed(self) -> bool:
+        """Reloads the configurations if the source changed, and returns whether it did."""
+        if not self._has_changed():
+            return False
+
+        self._set_user_confs(self._load())
+        logger.info(f"Loaded {len(self._user_confs)} user configurations")
+        return True
+
+    def _set_user_confs(self, user_confs: Iterable[UserConf]) -> None:
+        self._user_confs = list(user_confs)
+        self._by_telegram_id = {}
+        self._by_search_url = {}
+        for conf in self._user_confs:
+            self._by_telegram_id.setdefault(conf.telegram_id, []).append(conf)
+            self._by_search_url.setdefault(
+                normalize_search_url(str(conf.search_url)), []
+            ).append(conf)
+
+    @abstractmethod
+    def _has_changed(self) -> bool:
+        """Returns whether the source changed since the last successful load."""
+
+    @abstractmethod
+    def _load(self) -> List[UserConf]:
+        """Returns the configurations of the source, remembering its state once loaded."""
+
+
+class JsonLinesUserConfStore(UserConfStore):
+    """Configurations stored in a JSON Lines file, one `UserConf` object per line.
+
+    Invalid lines are logged and skipped. Lines unchanged since the last load are not validated again.
+    """
+
+    def __init__(self, path: str | Path):
+        super().__init__()
+        self.path = Path(path)
+        self._file_signature: Tuple[int, int] | None = None
+        self._parsed_lines: Dict[str, UserConf] = {}
+        self.reload_if_changed()
+
+    def _has_changed(self) -> bool:
+        return self._signature() != self._file_signature
+
+    def _signature(self) -> Tuple[int, int]:
+        stat = self.path.stat()
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self) -> List[UserConf]:
+        # Taken before reading, so that a write during the load is picked up next time.
+        signature = self._signature()
+        parsed_lines: Dict[str, UserConf] = {}
+        user_confs = []
+        with self.path.open(encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+
+                conf = self._parsed_lines.get(line) or parsed_lines.get(line)
+                if conf is None:
+                    try:
+                        conf = UserConf.model_validate_json(line)
+                    except ValidationError as e:
+                        logger.error(
+                            f"Invalid configuration at {self.path}:{line_number}: {e}"
+                        )
+                        continue
+
+                parsed_lines[line] = conf
+                user_confs.append(conf)
+
+        self._parsed_lines = parsed_lines
+        self._file_signature = signature
+        return user_confs
+
+
+class SqliteUserConfStore(UserConfStore):
+    """Configurations stored in a SQLite table, as `UserConf` JSON documents.
+
+    Changes made by other processes are detected with SQLite's data version, and
+    only the rows whose `updated_at` changed are validated again.
+    """
+
+    def __init__(self, path: str | Path):
+        super().__init__()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS user_confs (
+                id INTEGER PRIMARY KEY,
+                conf TEXT NOT NULL,
+                updated_at REAL NOT NULL DEFAULT (julianday('now'))
+            );
+            CREATE TRIGGER IF NOT EXISTS user_confs_updated_at
+                AFTER UPDATE OF conf ON user_confs
+            BEGIN
+                UPDATE user_confs SET updated_at = julianday('now') WHERE id = NEW.id;
+            END;
+            """
+        )
+        self._data_version: int | None = None
+        self._rows: Dict[int, Tuple[float, UserConf]] = {}
+        self.reload_if_changed()
+
+    def add(self, conf: UserConf) -> int:
+        """Adds a configuration, and returns its id."""
+        with self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO user_confs (conf) VALUES (?)", (conf.model_dump_json(),)
+            )
+        self._data_version = None  # our own writes don't change the data version
+        return cursor.lastrowid  # type: ignore
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _has_changed(self) -> bool:
+        return self._current_data_version() != self._data_version
+
+    def _current_data_version(self) -> int:
+        (data_version,) = self._connection.execute("PRAGMA data_version").fetchone()
+        return data_version
+
+    def _load(self) -> List[UserConf]:
+        data_version = self._current_data_version()
+        versions = dict(
+            self._connection.execute("SELECT id, updated_at FROM user_confs")
+        )
+        changed_ids = [
+            row_id
+            for row_id, updated_at in versions.items()
+            if row_id not in self._rows or self._rows[row_id][0] != updated_at
+        ]
+
+        unchanged_ids = versions.keys() - set(changed_ids)
+        rows = {row_id: self._rows[row_id] for row_id in unchanged_ids}
+        # Stay well below SQLite's limit on the number of query parameters
+        for start in range(0, len(changed_ids), 500):
+            batch = changed_ids[start : start + 500]
+            for row_id, conf_json, updated_at in self._connection.execute(
+                f"SELECT id, conf, updated_at FROM user_confs WHERE id IN ({','.join('?' * len(batch))})",
+                batch,
+            ):
+                try:
+                    rows[row_id] = (updated_at, UserConf.model_validate_json(conf_json))
+                except ValidationError as e:
+                    logger.error(f"Invalid configuration with id {row_id}: {e}")
+
+        self._rows = rows
+        self._data_version = data_version
+        return [conf for _, conf in (rows[row_id] for row_id in sorted(rows))]
+
+
+def open_user_conf_store(path: str | Path) -> UserConfStore:
+    """Opens a SQLite store for .sqlite3, .sqlite and .db files, a JSON Lines store otherwise."""
+    if Path(path).suffix in (".sqlite3", ".sqlite", ".db"):
+        return SqliteUserConfStore(path)
+    return JsonLinesUserConfStore(path)
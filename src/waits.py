@@ -0,0 +1,30 @@
+import logging
+from time import perf_counter
+from typing import Callable, TypeVar
+
+from selenium.webdriver.chrome.webdriver import WebDriver
+from selenium.webdriver.support.ui import WebDriverWait
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def wait_for(
+    driver: WebDriver,
+    condition: Callable[[WebDriver], T],
+    description: str,
+    timeout: float = 10,
+) -> T:
+    """Waits until `condition` is met and returns its result, as soon as it is.
+
+    Raises a TimeoutException if it isn't met within `timeout` seconds. The time
+    spent waiting is logged so that slow steps are visible.
+    """
+    start = perf_counter()
+    try:
+        return WebDriverWait(driver, timeout).until(
+            condition, message=f"Timed out after {timeout}s waiting for {description}"
+        )
+    finally:
+        logger.info(f"Waited {perf_counter() - start:.2f}s for {description}")
@@ -0,0 +1,200 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from src.browser_pool import BrowserPool, BrowserPoolClosedError
+from src.parser import Parser
+from src.session_manager import SessionManager
+from tests.test_http_fetcher import SEARCH_PAGE
+
+SEARCH_URL = "https://trouverunlogement.lescrous.fr/tools/36/search"
+COOKIES = [{"name": "PHPSESSID", "value": "abc"}]
+
+
+class FakeDriver:
+    """Stands in for a Chrome WebDriver, serving the same search page for every URL."""
+
+    def __init__(self):
+        self.current_url = ""
+        self.cookies: list[dict] = []
+        self.cdp_commands: list[str] = []
+        self.quit_called = False
+        self.alive = True
+        self.memory = 1000
+        self.in_use = threading.Lock()
+
+    def get(self, url: str) -> None:
+        assert self.in_use.acquire(blocking=False), "driver used concurrently"
+        sleep(0.01)
+        self.current_url = url
+        self.in_use.release()
+
+    @property
+    def page_source(self) -> str:
+        return SEARCH_PAGE
+
+    def find_element(self, by, value):
+        return object()
+
+    def add_cookie(self, cookie: dict) -> None:
+        self.cookies.append(cookie)
+
+    def get_cookies(self) -> list[dict]:
+        return self.cookies
+
+    def execute_cdp_cmd(self, command: str, params: dict) -> dict:
+        self.cdp_commands.append(command)
+        return {}
+
+    def execute_script(self, script: str):
+        if not self.alive:
+            raise WebDriverException("chrome not reachable")
+        if "performance.memory" in script:
+            return self.memory
+        return 1
+
+    def quit(self) -> None:
+        self.quit_called = True
+
+
+class DriverFactory:
+    def __init__(self):
+        self.drivers: list[FakeDriver] = []
+        self._lock = threading.Lock()
+
+    def __call__(self) -> FakeDriver:
+        driver = FakeDriver()
+        with self._lock:
+            self.drivers.append(driver)
+        return driver
+
+
+def test_pool_reuses_warm_authenticated_browsers():
+    factory = DriverFactory()
+
+    with BrowserPool(factory, COOKIES, size=2) as pool:  # type: ignore
+        for _ in range(5):
+            pool.fetch(SEARCH_URL)
+
+    assert len(factory.drivers) == 2
+    assert all(driver.cookies == COOKIES for driver in factory.drivers)
+    assert all(
+        "Network.setBlockedURLs" in driver.cdp_commands for driver in factory.drivers
+    )
+    assert all(driver.quit_called for driver in factory.drivers)
+
+
+def test_pool_serves_concurrent_fetches_with_distinct_browsers():
+    factory = DriverFactory()
+
+    with BrowserPool(factory, COOKIES, size=3) as pool:  # type: ignore
+        with ThreadPoolExecutor(6) as executor:
+            pages = list(executor.map(pool.fetch, [SEARCH_URL] * 12))
+
+    assert pages == [SEARCH_PAGE] * 12
+    assert len(factory.drivers) == 3
+
+
+def test_pool_recycles_browsers_after_max_uses():
+    factory = DriverFactory()
+
+    with BrowserPool(factory, COOKIES, size=1, max_uses=2) as pool:  # type: ignore
+        for _ in range(5):
+            pool.fetch(SEARCH_URL)
+
+    assert len(factory.drivers) == 3
+    assert all(driver.quit_called for driver in factory.drivers)
+
+
+def test_pool_recycles_browsers_on_memory_growth():
+    factory = DriverFactory()
+
+    with BrowserPool(factory, COOKIES, size=1, max_memory_growth=500) as pool:  # type: ignore
+        pool.fetch(SEARCH_URL)
+        factory.drivers[0].memory += 1000
+        pool.fetch(SEARCH_URL)
+        pool.fetch(SEARCH_URL)
+
+    assert len(factory.drivers) == 2
+    assert factory.drivers[0].quit_called
+
+
+def test_pool_replaces_unhealthy_browsers():
+    factory = DriverFactory()
+
+    with BrowserPool(factory, COOKIES, size=1) as pool:  # type: ignore
+        pool.fetch(SEARCH_URL)
+        factory.drivers[0].alive = False
+        pool.fetch(SEARCH_URL)
+
+    assert len(factory.drivers) == 2
+    assert factory.drivers[0].quit_called
+
+
+def test_pool_adopts_logged_in_browser():
+    factory = DriverFactory()
+    logged_in = FakeDriver()
+
+    pool = BrowserPool(factory, COOKIES, size=1, drivers=[logged_in])  # type: ignore
+    pool.fetch(SEARCH_URL)
+    pool.close()
+
+    assert factory.drivers == []
+    assert logged_in.quit_called
+
+
+def test_closed_pool_refuses_fetches():
+    factory = DriverFactory()
+    pool = BrowserPool(factory, COOKIES, size=1)  # type: ignore
+    pool.warm_up()
+    pool.close()
+
+    with pytest.raises(BrowserPoolClosedError):
+        pool.fetch(SEARCH_URL)
+    assert factory.drivers[0].quit_called
+
+
+def test_closing_pool_fails_waiting_fetches_and_quits_busy_browsers():
+    factory = DriverFactory()
+    pool = BrowserPool(factory, COOKIES, size=1)  # type: ignore
+
+    with ThreadPoolExecutor(1) as executor:
+        with pool.driver() as pooled:
+            waiting = executor.submit(pool.fetch, SEARCH_URL)
+            pool.close()
+            with pytest.raises(BrowserPoolClosedError):
+                waiting.result(timeout=2)
+            assert not pooled.driver.quit_called
+
+    assert factory.drivers[0].quit_called
+    assert pool._started == 0
+
+
+class FakeAuthenticator:
+    def authenticate_driver(self, driver: FakeDriver) -> None:
+        driver.cookies = list(COOKIES)
+
+
+def test_session_manager_pools_a_single_browser():
+    factory = DriverFactory()
+    session_manager = SessionManager(FakeAuthenticator(), factory)  # type: ignore
+
+    fetcher = session_manager.get_fetcher()
+    fetcher.fetch(SEARCH_URL)
+
+    assert isinstance(fetcher, BrowserPool)
+    assert len(factory.drivers) == 1
+    assert "Network.setBlockedURLs" in factory.drivers[0].cdp_commands
+
+    session_manager.close()
+    assert factory.drivers[0].quit_called
+
+
+def test_parser_fetches_through_pool():
+    with BrowserPool(DriverFactory(), COOKIES, size=2) as pool:  # type: ignore
+        search_results = Parser(pool).get_accommodations(SEARCH_URL)  # type: ignore
+
+    assert search_results.count == 3
@@ -1,6 +1,15 @@
+import lxml.html
 import pytest
 from bs4 import BeautifulSoup
-from src.parser import Parser, parse_accommodation_card, parse_accommodations_summaries
+from src.parser import (
+    Parser,
+    _parse_card_record,
+    _parse_card_record_lxml,
+    iter_accommodations,
+    parse_accommodation_card,
+    parse_accommodation_card_lxml,
+    parse_accommodations_summaries,
+)
 from src.models import Accommodation
 from typing import Dict
 
@@ -40,3 +49,97 @@ def test_parse_accommodation_card(html: str, expected: Accommodation):
     assert result.title == expected.title
     assert result.image_url == expected.image_url
     assert result.price == expected.price
+
+
+# Cards with missing or unusual fields, on which both parser backends must agree
+edge_cases = [
+    """<div class="fr-card"><h3 class="fr-card__title">Sans lien</h3><p class="fr-badge">  </p></div>""",
+    """<div class="fr-card"><h3 class="fr-card__title"><a>Lien sans href</a></h3><img class="fr-responsive-img"></div>""",
+    """<div class="fr-card"><h3 class="fr-card__title"><a href="/tools/36/accommodations/12">A &amp; B</a></h3><p class="fr-card__detail fr-icon-group-fill">Couple</p><p class="fr-card__desc">Adresse</p><p class="fr-badge">1 234,5 €</p><p class="fr-badge">2 €</p></div>""",
+    """<div class="fr-card"><div class="fr-card__title">Pas un titre</div></div>""",
+]
+
+
+@pytest.mark.parametrize("html", [*ground_truth.keys(), *edge_cases])
+def test_lxml_backend_matches_bs4(html: str):
+    expected = parse_accommodation_card(BeautifulSoup(html, "html.parser"))
+
+    assert parse_accommodation_card_lxml(lxml.html.fromstring(html)) == expected
+
+
+@pytest.mark.parametrize("html", [*ground_truth.keys(), *edge_cases])
+def test_records_convert_to_the_same_models(html: str):
+    record = _parse_card_record(BeautifulSoup(html, "html.parser"))
+
+    assert _parse_card_record_lxml(lxml.html.fromstring(html)) == record
+    expected = parse_accommodation_card(BeautifulSoup(html, "html.parser"))
+    assert (record.to_model() if record else None) == expected
+
+
+class StaticFetcher:
+    def __init__(self, html: str):
+        self.html = html
+
+    def fetch(self, url: str) -> str:
+        return self.html
+
+
+@pytest.mark.parametrize(
+    "heading,expected_count",
+    [
+        ("3 logements trouvés", 3),
+        ("Aucun logement trouvé", 0),
+        ("", None),
+    ],
+)
+def test_parser_backends_give_identical_results(heading: str, expected_count):
+    html = (
+        f"""<html><body><h2 class="SearchResults-desktop fr-h4 svelte-1abcdef">{heading}</h2><ul>"""
+        + "".join([*ground_truth.keys(), *edge_cases])
+        + "</ul></body></html>"
+    )
+    search_url = "https://trouverunlogement.lescrous.fr/tools/36/search"
+
+    bs4_results = Parser(StaticFetcher(html), backend="bs4").get_accommodations(
+        search_url
+    )  # type: ignore
+    lxml_results = Parser(StaticFetcher(html), backend="lxml").get_accommodations(
+        search_url
+    )  # type: ignore
+
+    assert bs4_results == lxml_results
+    assert bs4_results.count == expected_count
+    assert len(bs4_results.accommodations) == len(ground_truth) + len(edge_cases) - 1
+
+
+SEARCH_PAGE = "<html><body><ul>" + "".join(ground_truth.keys()) + "</ul></body></html>"
+
+
+@pytest.mark.parametrize("backend", ["bs4", "lxml"])
+def test_iter_accommodations(backend):
+    accommodations = list(iter_accommodations(SEARCH_PAGE, backend))
+
+    assert accommodations == parse_accommodations_summaries(
+        BeautifulSoup(SEARCH_PAGE, "html.parser")
+    )
+
+
+@pytest.mark.parametrize("backend", ["bs4", "lxml"])
+def test_iter_accommodations_stops_early(backend):
+    ids = [expected.id for expected in ground_truth.values()]
+
+    limited = iter_accommodations(SEARCH_PAGE, backend, limit=2)
+    until_seen = iter_accommodations(SEARCH_PAGE, backend, stop_ids={ids[1]})
+
+    assert [accommodation.id for accommodation in limited] == ids[:2]
+    assert [accommodation.id for accommodation in until_seen] == ids[:1]
+
+
+def test_iter_accommodations_parses_unclosed_last_card():
+    first, second = list(ground_truth.keys())[:2]
+    html = "<ul>" + first + second.removesuffix("</div> </li>")
+
+    assert [a.id for a in iter_accommodations(html, "lxml")] == [
+        a.id for a in iter_accommodations(html, "bs4")
+    ]
+    assert len(list(iter_accommodations(html, "lxml"))) == 2
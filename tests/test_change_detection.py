@@ -0,0 +1,256 @@
+import sqlite3
+
+import pytest
+
+from src.daemon import Daemon
+from src.models import AccommodationRecord, UserConf
+from src.notification_builder import NotificationBuilder
+from src.parser import Parser
+from src.seen_store import SeenStore
+from tests.test_daemon import FakeNotifier
+from tests.test_pagination import SEARCH_URL, PagesFetcher, results_page
+
+CONF = UserConf(conf_title="Test", telegram_id="42", search_url=SEARCH_URL)  # type: ignore
+
+
+class CountingNotificationBuilder(NotificationBuilder):
+    def __init__(self):
+        super().__init__()
+        self.builds = 0
+
+    def search_results_notifications(self, search_results):
+        self.builds += 1
+        return super().search_results_notifications(search_results)
+
+
+class FixedSessionManager:
+    def __init__(self, fetcher):
+        self.fetcher = fetcher
+
+    def get_fetcher(self):
+        return self.fetcher
+
+
+@pytest.mark.parametrize("backend", ["bs4", "lxml"])
+def test_parser_reuses_unchanged_results(backend):
+    fetcher = PagesFetcher({SEARCH_URL: results_page(2, [1, 2], last_page=1)})
+    parser = Parser(fetcher, backend=backend)
+
+    first = parser.get_accommodations(SEARCH_URL)  # type: ignore
+    # Changes outside of the listing don't matter
+    fetcher.pages[SEARCH_URL] = fetcher.pages[SEARCH_URL].replace(
+        "<html>", '<html><head><meta name="csrf-token" content="abc"></head>'
+    )
+    assert parser.get_accommodations(SEARCH_URL) is first  # type: ignore
+
+    fetcher.pages[SEARCH_URL] = results_page(3, [1, 2, 3], last_page=1)
+    changed = parser.get_accommodations(SEARCH_URL)  # type: ignore
+    assert changed is not first
+    assert [a.id for a in changed.accommodations] == [1, 2, 3]
+
+
+def test_parser_detects_changes_on_other_pages():
+    fetcher = PagesFetcher(
+        {
+            SEARCH_URL: results_page(4, [1, 2], last_page=2),
+            f"{SEARCH_URL}&page=2": results_page(4, [3, 4], last_page=2),
+        }
+    )
+    parser = Parser(fetcher)
+
+    first = parser.get_accommodations(SEARCH_URL)  # type: ignore
+    assert parser.get_accommodations(SEARCH_URL) is first  # type: ignore
+
+    fetcher.pages[f"{SEARCH_URL}&page=2"] = results_page(4, [3, 5], last_page=2)
+    changed = parser.get_accommodations(SEARCH_URL)  # type: ignore
+    assert [a.id for a in changed.accommodations] == [1, 2, 3, 5]
+
+
+def test_daemon_skips_unchanged_results(tmp_path):
+    fetcher = PagesFetcher({SEARCH_URL: results_page(2, [1, 2], last_page=1)})
+    builder = CountingNotificationBuilder()
+    notifier = FakeNotifier()
+    seen_store = SeenStore(str(tmp_path / "seen.sqlite3"))
+    daemon = Daemon(
+        FixedSessionManager(fetcher),
+        builder,
+        notifier,
+        [CONF],
+        seen_store=seen_store,  # type: ignore
+    )
+
+    daemon.run_once()
+    daemon.run_once()
+
+    assert builder.builds == 1
+    assert len(notifier.sent) == 1
+
+    fetcher.pages[SEARCH_URL] = results_page(3, [1, 2, 3], last_page=1)
+    daemon.run_once()
+
+    assert builder.builds == 2
+    assert len(notifier.sent) == 2
+    seen_store.close()
+
+
+class FailingNotifier(FakeNotifier):
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+
+    def send_notification(self, telegramId, notification, on_sent=None):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("Telegram is unreachable")
+        super().send_notification(telegramId, notification, on_sent)
+
+
+def test_daemon_notifies_again_after_failed_send(tmp_path):
+    fetcher = PagesFetcher({SEARCH_URL: results_page(2, [1, 2], last_page=1)})
+    notifier = FailingNotifier(failures=1)
+    seen_store = SeenStore(str(tmp_path / "seen.sqlite3"))
+    daemon = Daemon(
+        FixedSessionManager(fetcher),
+        NotificationBuilder(),
+        notifier,
+        [CONF],
+        seen_store=seen_store,  # type: ignore
+    )
+
+    daemon.run_once()
+    assert notifier.sent == []
+
+    fetcher.pages[SEARCH_URL] = results_page(3, [1, 2, 3], last_page=1)
+    daemon.run_once()
+
+    assert len(notifier.sent) == 1
+    # The listings of the failed notification are sent again, with the new one
+    assert all(f"/accommodations/{i}" in notifier.sent[0][1].message for i in (1, 2, 3))
+    seen_store.close()
+
+
+class FlakySeenStore(SeenStore):
+    """Seen store whose next lookup fails once `fail_next_lookup` is set."""
+
+    fail_next_lookup = False
+
+    def new_or_changed(self, conf, accommodations):
+        if self.fail_next_lookup:
+            self.fail_next_lookup = False
+            raise sqlite3.OperationalError("database is locked")
+        return super().new_or_changed(conf, accommodations)
+
+
+def test_daemon_notifies_again_after_failed_lookup(tmp_path):
+    fetcher = PagesFetcher({SEARCH_URL: results_page(2, [1, 2], last_page=1)})
+    notifier = FakeNotifier()
+    seen_store = FlakySeenStore(str(tmp_path / "seen.sqlite3"))
+    daemon = Daemon(
+        FixedSessionManager(fetcher),
+        NotificationBuilder(),
+        notifier,
+        [CONF],
+        seen_store=seen_store,  # type: ignore
+    )
+    daemon.run_once()
+
+    fetcher.pages[SEARCH_URL] = results_page(3, [1, 2, 5], last_page=1)
+    seen_store.fail_next_lookup = True
+    daemon.run_once()
+    assert len(notifier.sent) == 1
+
+    daemon.run_once()
+
+    assert len(notifier.sent) == 2
+    assert "/accommodations/5" in notifier.sent[1][1].message
+    seen_store.close()
+
+
+def test_daemon_retries_failed_send_of_unchanged_results(tmp_path):
+    fetcher = PagesFetcher({SEARCH_URL: results_page(2, [1, 2], last_page=1)})
+    notifier = FailingNotifier(failures=1)
+    seen_store = SeenStore(str(tmp_path / "seen.sqlite3"))
+    daemon = Daemon(
+        FixedSessionManager(fetcher),
+        NotificationBuilder(),
+        notifier,
+        [CONF],
+        seen_store=seen_store,  # type: ignore
+    )
+
+    daemon.run_once()
+    daemon.run_once()
+    daemon.run_once()
+
+    assert len(notifier.sent) == 1
+    seen_store.close()
+
+
+def test_daemon_keeps_unchanged_results_from_expiring(tmp_path):
+    fetcher = PagesFetcher({SEARCH_URL: results_page(2, [1, 2], last_page=1)})
+    seen_store = SeenStore(str(tmp_path / "seen.sqlite3"))
+    daemon = Daemon(
+        FixedSessionManager(fetcher),
+        NotificationBuilder(),
+        FakeNotifier(),
+        [CONF],
+        seen_store=seen_store,  # type: ignore
+    )
+    daemon.run_once()
+
+    def last_seen() -> list:
+        return [
+            row[0]
+            for row in seen_store._connection.execute(
+                "SELECT last_seen FROM seen_accommodations ORDER BY accommodation_id"
+            )
+        ]
+
+    seen_store._connection.execute("UPDATE seen_accommodations SET last_seen = 0")
+    daemon.run_once()
+
+    assert len(last_seen()) == 2
+    assert all(timestamp > 0 for timestamp in last_seen())
+    seen_store.close()
+
+
+def test_daemon_only_validates_new_accommodations(tmp_path, monkeypatch):
+    fetcher = PagesFetcher({SEARCH_URL: results_page(2, [1, 2], last_page=1)})
+    notifier = FakeNotifier()
+    seen_store = SeenStore(str(tmp_path / "seen.sqlite3"))
+    daemon = Daemon(
+        FixedSessionManager(fetcher),
+        NotificationBuilder(),
+        notifier,
+        [CONF],
+        seen_store=seen_store,  # type: ignore
+    )
+    daemon.run_once()
+
+    validated = []
+    to_model = AccommodationRecord.to_model
+    monkeypatch.setattr(
+        AccommodationRecord,
+        "to_model",
+        lambda record: validated.append(record.id) or to_model(record),
+    )
+    fetcher.pages[SEARCH_URL] = results_page(3, [1, 2, 3], last_page=1)
+    daemon.run_once()
+
+    assert validated == [3]
+    assert len(notifier.sent) == 2
+    seen_store.close()
+
+
+def test_daemon_resends_unchanged_results_without_seen_store():
+    fetcher = PagesFetcher({SEARCH_URL: results_page(2, [1, 2], last_page=1)})
+    builder = CountingNotificationBuilder()
+    notifier = FakeNotifier()
+    daemon = Daemon(FixedSessionManager(fetcher), builder, notifier, [CONF])  # type: ignore
+
+    daemon.run_once()
+    daemon.run_once()
+
+    assert builder.builds == 1
+    assert len(notifier.sent) == 2
+    assert notifier.sent[0][1] is notifier.sent[1][1]
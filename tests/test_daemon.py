@@ -0,0 +1,165 @@
+import threading
+
+from src.daemon import Daemon
+from src.fetchers import SessionExpiredError
+from src.models import Notification, UserConf
+from src.notification_builder import NotificationBuilder
+from src.user_conf_store import JsonLinesUserConfStore
+from tests.test_http_fetcher import SEARCH_PAGE
+
+CONF = UserConf(
+    conf_title="Test",
+    telegram_id="42",
+    search_url="https://trouverunlogement.lescrous.fr/tools/36/search",  # type: ignore
+)
+
+OTHER_SEARCH_URL = (
+    "https://trouverunlogement.lescrous.fr/tools/36/search?bounds=1_2_3_4"
+)
+
+
+class ExpiredFetcher:
+    def fetch(self, url: str) -> str:
+        raise SessionExpiredError(url)
+
+
+class StaticFetcher:
+    def fetch(self, url: str) -> str:
+        return SEARCH_PAGE
+
+
+class FakeSessionManager:
+    def __init__(self):
+        self.refreshes = 0
+
+    def get_fetcher(self):
+        return ExpiredFetcher()
+
+    def refresh(self):
+        self.refreshes += 1
+        return StaticFetcher()
+
+
+class FakeNotifier:
+    def __init__(self):
+        self.sent: list[tuple[str, Notification]] = []
+
+    def send_notification(
+        self, telegramId: str, notification: Notification, on_sent=None
+    ) -> None:
+        self.sent.append((telegramId, notification))
+        if on_sent:
+            on_sent()
+
+
+def test_daemon_refreshes_expired_session():
+    session_manager = FakeSessionManager()
+    notifier = FakeNotifier()
+    daemon = Daemon(session_manager, NotificationBuilder(), notifier, [CONF])  # type: ignore
+
+    daemon.run_once()
+
+    assert session_manager.refreshes == 1
+    assert [telegram_id for telegram_id, _ in notifier.sent] == ["42"]
+
+
+def test_daemon_polls_until_stopped():
+    notifier = FakeNotifier()
+    conf = CONF.model_copy(update={"check_interval": 0.01})
+    daemon = Daemon(FakeSessionManager(), NotificationBuilder(), notifier, [conf])  # type: ignore
+
+    timer = threading.Timer(0.5, daemon.stop)
+    timer.start()
+    daemon.run()  # signal handlers can only be installed from the main thread
+    timer.join()
+
+    assert len(notifier.sent) > 1
+
+
+def test_daemon_checks_configurations_concurrently():
+    notifier = FakeNotifier()
+    confs = [CONF.model_copy(update={"telegram_id": str(i)}) for i in range(8)]
+    daemon = Daemon(
+        FakeSessionManager(),
+        NotificationBuilder(),
+        notifier,
+        confs,
+        max_workers=4,  # type: ignore
+    )
+
+    daemon.run_once()
+
+    assert sorted(telegram_id for telegram_id, _ in notifier.sent) == sorted(
+        conf.telegram_id for conf in confs
+    )
+
+
+def test_daemon_fetches_shared_searches_once():
+    fetched: list[str] = []
+
+    class CountingFetcher(StaticFetcher):
+        def fetch(self, url: str) -> str:
+            fetched.append(url)
+            return super().fetch(url)
+
+    session_manager = FakeSessionManager()
+    session_manager.get_fetcher = CountingFetcher  # type: ignore
+    notifier = FakeNotifier()
+    confs = [CONF.model_copy(update={"telegram_id": str(i)}) for i in range(3)]
+
+    Daemon(session_manager, NotificationBuilder(), notifier, confs).run_once()  # type: ignore
+
+    assert len(fetched) == 1
+    assert len(notifier.sent) == 3
+
+
+def test_daemon_hot_reloads_configurations(tmp_path):
+    path = tmp_path / "users.jsonl"
+    conf = CONF.model_copy(update={"check_interval": 0.05})
+    path.write_text(conf.model_dump_json())
+    store = JsonLinesUserConfStore(path)
+    notifier = FakeNotifier()
+    daemon = Daemon(
+        FakeSessionManager(),  # type: ignore
+        NotificationBuilder(),
+        notifier,  # type: ignore
+        store.user_confs(),
+        conf_store=store,
+        reload_interval=0.05,
+    )
+
+    def add_user():
+        new_conf = UserConf(
+            telegram_id="43", conf_title=None, search_url=OTHER_SEARCH_URL
+        )  # type: ignore
+        path.write_text(conf.model_dump_json() + "\n" + new_conf.model_dump_json())
+
+    threading.Timer(0.2, add_user).start()
+    timer = threading.Timer(0.6, daemon.stop)
+    timer.start()
+    daemon.run()
+    timer.join()
+
+    assert {telegram_id for telegram_id, _ in notifier.sent} == {"42", "43"}
+
+
+def test_daemon_checks_inline_in_calling_thread():
+    fetching_threads: list[threading.Thread] = []
+
+    class ThreadRecordingFetcher(StaticFetcher):
+        def fetch(self, url: str) -> str:
+            fetching_threads.append(threading.current_thread())
+            return super().fetch(url)
+
+    session_manager = FakeSessionManager()
+    session_manager.get_fetcher = ThreadRecordingFetcher  # type: ignore
+    notifier = FakeNotifier()
+    confs = [CONF, CONF.model_copy(update={"search_url": OTHER_SEARCH_URL})]
+    daemon = Daemon(
+        session_manager, NotificationBuilder(), notifier, confs, max_workers=4
+    )  # type: ignore
+
+    daemon.run_once(inline=True)
+
+    assert fetching_threads == [threading.current_thread()] * 2
+    assert len(notifier.sent) == 2
@@ -0,0 +1,147 @@
+import json
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List
+
+import pytest
+import telepot  # type: ignore
+import telepot.api  # type: ignore
+
+from src.delivery_queue import DeliveryQueue
+from src.models import Notification
+from src.telegram_notifier import MAX_MESSAGE_LENGTH, TelegramNotifier, split_message
+
+
+class FakeBotApi(ThreadingHTTPServer):
+    """Local stand-in for the Telegram Bot API, answering 429 to the first `flood_limited` messages."""
+
+    def __init__(self, flood_limited: int = 0):
+        super().__init__(("127.0.0.1", 0), FakeBotApiHandler)
+        self.flood_limited = flood_limited
+        self.messages: List[dict] = []
+        self.lock = threading.Lock()
+
+
+class FakeBotApiHandler(BaseHTTPRequestHandler):
+    server: FakeBotApi
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        form = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+        )
+        fields = {
+            part.get_param("name", header="content-disposition"): part.get_content()
+            for part in form.iter_parts()
+        }
+
+        with self.server.lock:
+            if self.server.flood_limited > 0:
+                self.server.flood_limited -= 1
+                response = {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": "Too Many Requests: retry after 0",
+                    "parameters": {"retry_after": 0},
+                }
+            else:
+                self.server.messages.append(fields)
+                response = {
+                    "ok": True,
+                    "result": {"message_id": len(self.server.messages)},
+                }
+
+        data = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def bot_api(monkeypatch) -> Iterator[FakeBotApi]:
+    server = FakeBotApi(flood_limited=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(
+        telepot.api, "_methodurl", lambda req, **_: f"{url}/bot{req[0]}/{req[1]}"
+    )
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_split_message():
+    lines = [f"[*Logement {i}*](https://example.com/{i}) (300.0€)" for i in range(300)]
+    message = "\n\n".join(lines)
+
+    chunks = split_message(message)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= MAX_MESSAGE_LENGTH for chunk in chunks)
+    assert "\n\n".join(chunks) == message
+
+
+def test_split_message_without_separators():
+    chunks = split_message("x" * 10000)
+
+    assert [len(chunk) for chunk in chunks] == [4096, 4096, 1808]
+
+
+def test_delivery_queue_retries_and_chunks(bot_api: FakeBotApi):
+    notifier = TelegramNotifier(telepot.Bot("TOKEN"))
+    long_message = "\n\n".join(f"Logement {i}" for i in range(1000))
+    delivered: List[str] = []
+
+    with DeliveryQueue(notifier, messages_per_chat_per_second=100, backoff=0) as queue:
+        queue.send_notification(
+            "1", Notification(message="Bonjour"), on_sent=lambda: delivered.append("1")
+        )
+        queue.send_notification("2", Notification(message=long_message))
+
+    assert bot_api.flood_limited == 0
+    assert delivered == ["1"]
+    assert [m["text"] for m in bot_api.messages if m["chat_id"] == "1"] == ["Bonjour"]
+    assert (
+        "\n\n".join(m["text"] for m in bot_api.messages if m["chat_id"] == "2")
+        == long_message
+    )
+
+
+class GatedNotifier:
+    """Records the messages sent, holding the first send until `gate` is set."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.messages: List[tuple[str, str]] = []
+
+    def send_message(self, telegramId: str, message: str, parse_mode: str) -> None:
+        self.gate.wait()
+        self.messages.append((telegramId, message))
+
+
+def test_delivery_queue_serves_other_chats_while_one_is_throttled():
+    notifier = GatedNotifier()
+
+    with DeliveryQueue(
+        notifier, max_workers=1, messages_per_chat_per_second=2
+    ) as queue:  # type: ignore
+        for i in range(3):
+            queue.send_notification("1", Notification(message=f"Bonjour {i}"))
+        queue.send_notification("2", Notification(message="Bonjour"))
+        notifier.gate.set()
+
+    assert notifier.messages == [
+        ("1", "Bonjour 0"),
+        ("2", "Bonjour"),
+        ("1", "Bonjour 1"),
+        ("1", "Bonjour 2"),
+    ]
@@ -0,0 +1,140 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+import pytest
+import requests
+
+from src.fetchers import HttpFetcher
+from src.parser import Parser
+from tests.test_card_parser import ground_truth
+
+SEARCH_PAGE = (
+    """<html><body><h2 class="SearchResults-desktop fr-h4 svelte-11sc5my">3 logements trouvés</h2><ul>"""
+    + "".join(ground_truth.keys())
+    + "</ul></body></html>"
+)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves a fixed search page, but only to clients sending the session cookie."""
+
+    def do_GET(self):
+        if "PHPSESSID=authenticated" not in (self.headers.get("Cookie") or ""):
+            self.send_response(403)
+            self.end_headers()
+            return
+
+        body = SEARCH_PAGE.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ValidatingHandler(BaseHTTPRequestHandler):
+    """Serves the search page with an ETag, answering 304 Not Modified when it matches."""
+
+    requests_headers: list = []
+
+    def do_GET(self):
+        ValidatingHandler.requests_headers.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body = SEARCH_PAGE.encode()
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ClientSideHandler(BaseHTTPRequestHandler):
+    """Serves the shell of a page whose search results are rendered by JavaScript."""
+
+    def do_GET(self):
+        body = b'<html><body><div id="app"></div><script src="/app.js"></script></body></html>'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(handler) -> Iterator[str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def server_url() -> Iterator[str]:
+    yield from serve(StandInHandler)
+
+
+@pytest.fixture
+def validating_server_url() -> Iterator[str]:
+    ValidatingHandler.requests_headers = []
+    yield from serve(ValidatingHandler)
+
+
+@pytest.fixture
+def client_side_server_url() -> Iterator[str]:
+    yield from serve(ClientSideHandler)
+
+
+def test_http_fetcher_reuses_cookies(server_url: str):
+    fetcher = HttpFetcher.from_cookies(
+        [{"name": "PHPSESSID", "value": "authenticated", "domain": "127.0.0.1"}]
+    )
+
+    search_results = Parser(fetcher).get_accommodations(f"{server_url}/tools/36/search")  # type: ignore
+
+    assert search_results.count == 3
+    assert [a.id for a in search_results.accommodations] == [
+        expected.id for expected in ground_truth.values()
+    ]
+
+
+def test_http_fetcher_raises_without_session(server_url: str):
+    fetcher = HttpFetcher.from_cookies([])
+
+    with pytest.raises(requests.HTTPError):
+        fetcher.fetch(f"{server_url}/tools/36/search")
+
+
+def test_http_fetcher_fetches_conditionally(validating_server_url: str):
+    fetcher = HttpFetcher.from_cookies([])
+
+    assert fetcher.fetch(f"{validating_server_url}/tools/36/search") == SEARCH_PAGE
+    assert fetcher.fetch(f"{validating_server_url}/tools/36/search") == SEARCH_PAGE
+
+    assert "If-None-Match" not in ValidatingHandler.requests_headers[0]
+    assert ValidatingHandler.requests_headers[1]["If-None-Match"] == '"v1"'
+
+
+def test_http_fetcher_warns_about_client_side_results(
+    client_side_server_url: str, validating_server_url: str, caplog
+):
+    fetcher = HttpFetcher.from_cookies([])
+
+    fetcher.fetch(f"{validating_server_url}/tools/36/search")
+    assert "rendered client-side" not in caplog.text
+
+    fetcher.fetch(f"{client_side_server_url}/tools/36/search")
+    assert "rendered client-side" in caplog.text
@@ -0,0 +1,135 @@
+import json
+
+import lxml.html
+import pytest
+import requests
+from bs4 import BeautifulSoup
+
+from src.metrics import Metrics, metrics
+from src.parser import (
+    Parser,
+    _try_parse_price_text,
+    parse_accommodation_card,
+    parse_accommodation_card_lxml,
+)
+from tests.test_card_parser import edge_cases
+from tests.test_daemon import StaticFetcher
+
+
+def test_counters_are_labelled():
+    registry = Metrics()
+
+    registry.inc("notifications_sent_total")
+    registry.inc("notifications_sent_total")
+    registry.inc("parse_failures_total", field="price")
+
+    assert registry.counter("notifications_sent_total") == 2
+    assert registry.counter("parse_failures_total", field="price") == 1
+    assert registry.counter("parse_failures_total", field="id") == 0
+
+
+def test_timer_records_failed_stages():
+    registry = Metrics()
+
+    with pytest.raises(ValueError):
+        with registry.timer("fetch"):
+            raise ValueError()
+
+    histogram = registry.histogram("stage_duration_seconds", stage="fetch")
+    assert histogram is not None and histogram.count == 1
+
+
+def test_prometheus_format():
+    registry = Metrics(prefix="test")
+    registry.inc("pages_fetched_total", engine="http")
+    registry.observe("stage_duration_seconds", 0.2, stage="parse")
+    registry.observe("stage_duration_seconds", 100, stage="parse")
+
+    text = registry.to_prometheus()
+
+    assert "# TYPE test_pages_fetched_total counter" in text
+    assert 'test_pages_fetched_total{engine="http"} 1' in text
+    assert 'test_stage_duration_seconds_bucket{stage="parse",le="0.1"} 0' in text
+    assert 'test_stage_duration_seconds_bucket{stage="parse",le="0.25"} 1' in text
+    assert 'test_stage_duration_seconds_bucket{stage="parse",le="+Inf"} 2' in text
+    assert 'test_stage_duration_seconds_count{stage="parse"} 2' in text
+
+
+def test_serve():
+    registry = Metrics()
+    registry.inc("cards_parsed_total", 3)
+    server = registry.serve(0, host="127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{server.server_port}"
+        assert (
+            "crous_notifier_cards_parsed_total 3" in requests.get(f"{url}/metrics").text
+        )
+        assert requests.get(f"{url}/metrics.json").json()["counters"][0]["value"] == 3
+        assert requests.get(f"{url}/other").status_code == 404
+    finally:
+        server.shutdown()
+
+
+def test_parser_is_instrumented():
+    cards_parsed = metrics.counter("cards_parsed_total")
+    search_results = Parser(StaticFetcher()).get_accommodations(
+        "https://trouverunlogement.lescrous.fr/tools/36/search"  # type: ignore
+    )
+    assert metrics.counter("cards_parsed_total") == cards_parsed + len(
+        search_results.accommodations
+    )
+
+    price_failures = metrics.counter("parse_failures_total", field="price")
+    unparsed_prices = metrics.counter("prices_unparsed_total")
+    _try_parse_price_text("de 418,4 à 481,2 €")
+    assert metrics.counter("parse_failures_total", field="price") == price_failures
+    assert metrics.counter("prices_unparsed_total") == unparsed_prices + 1
+    _try_parse_price_text(" ")
+    assert metrics.counter("parse_failures_total", field="price") == price_failures + 1
+    assert json.dumps(metrics.to_dict())
+
+
+@pytest.mark.parametrize("html", edge_cases)
+def test_parser_backends_count_the_same_failures(html: str):
+    def failures() -> dict:
+        return {
+            field: metrics.counter("parse_failures_total", field=field)
+            for field in ("url", "id", "image_url", "price")
+        }
+
+    before = failures()
+    parse_accommodation_card(BeautifulSoup(html, "html.parser"))
+    after_bs4 = failures()
+    parse_accommodation_card_lxml(lxml.html.fromstring(html))
+    after_lxml = failures()
+
+    for field in before:
+        assert after_lxml[field] - after_bs4[field] == after_bs4[field] - before[field]
+
+
+@pytest.mark.parametrize("backend", ["bs4", "lxml"])
+def test_valid_cards_count_no_failures(backend):
+    def failures() -> float:
+        return sum(
+            metrics.counter("parse_failures_total", field=field)
+            for field in ("url", "id", "image_url", "price")
+        )
+
+    before = failures()
+    Parser(StaticFetcher(), backend=backend).get_accommodations(
+        "https://trouverunlogement.lescrous.fr/tools/36/search"  # type: ignore
+    )
+
+    assert failures() == before
+
+
+def test_missing_url_is_not_counted_as_a_missing_id():
+    card = '<div class="fr-card"><h3 class="fr-card__title">Room</h3></div>'
+
+    url_failures = metrics.counter("parse_failures_total", field="url")
+    id_failures = metrics.counter("parse_failures_total", field="id")
+    parse_accommodation_card(BeautifulSoup(card, "html.parser"))
+    parse_accommodation_card_lxml(lxml.html.fromstring(card))
+
+    assert metrics.counter("parse_failures_total", field="url") == url_failures + 2
+    assert metrics.counter("parse_failures_total", field="id") == id_failures
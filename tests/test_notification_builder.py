@@ -0,0 +1,85 @@
+from src.models import Accommodation, SearchResults
+from src.notification_builder import NotificationBuilder
+
+SEARCH_URL = "https://trouverunlogement.lescrous.fr/tools/42/search?bounds=1_2_3_4"
+
+RESULTS = SearchResults(
+    search_url=SEARCH_URL,  # type: ignore
+    count=2,
+    accommodations=[
+        Accommodation(id=506, title="LE VELUM", price=393.46),
+        Accommodation(
+            id=1185, title="Residence J.P. Sartre", price="de 418,4 à 481,2 €"
+        ),
+    ],
+)
+
+
+def test_search_results_notification():
+    notification = NotificationBuilder().search_results_notification(RESULTS)
+
+    assert notification is not None
+    assert notification.message == (
+        "Bonne nouvelle 😯, 2 logements sont disponibles : \n "
+        "[*LE VELUM*](https://trouverunlogement.lescrous.fr/tools/42/accommodations/506) (393.46€)"
+        "\n\n"
+        "[*Residence J.P. Sartre*](https://trouverunlogement.lescrous.fr/tools/42/accommodations/1185) (de 418,4 à 481,2 €)"
+        f"\n\n{SEARCH_URL}"
+    )
+
+
+def test_html_notification_escapes_content():
+    results = RESULTS.model_copy(
+        update={"accommodations": [Accommodation(id=1, title="A & B", price=300.0)]}
+    )
+
+    notification = NotificationBuilder(
+        language="en", parse_mode="HTML"
+    ).search_results_notification(results)
+
+    assert notification is not None
+    assert notification.parse_mode == "HTML"
+    assert notification.message.startswith(
+        "Good news 😯, 1 accommodation is available: \n "
+        '<a href="https://trouverunlogement.lescrous.fr/tools/42/accommodations/1"><b>A &amp; B</b></a> (300.0€)'
+    )
+
+
+def test_html_notification_escapes_search_url():
+    search_url = "https://trouverunlogement.lescrous.fr/tools/42/search?bounds=1_2_3_4&occupationModes=alone&page=2"
+    results = RESULTS.model_copy(update={"search_url": search_url})
+
+    notification = NotificationBuilder(parse_mode="HTML").search_results_notification(
+        results
+    )
+
+    assert notification is not None
+    assert notification.message.endswith(
+        "\n\nhttps://trouverunlogement.lescrous.fr/tools/42/search?bounds=1_2_3_4&amp;occupationModes=alone&amp;page=2"
+    )
+    assert "&occupationModes" not in notification.message
+
+
+def test_rendered_lines_cache_is_bounded_and_content_aware():
+    builder = NotificationBuilder(cache_size=2)
+    builder.search_results_notification(RESULTS)
+    changed_price = RESULTS.accommodations[0].model_copy(update={"price": 380.0})
+
+    notification = builder.search_results_notification(
+        RESULTS.model_copy(update={"accommodations": [changed_price]})
+    )
+
+    assert notification is not None
+    assert "(380.0€)" in notification.message
+    assert len(builder._lines) == 2
+
+
+def test_search_results_notifications_batch():
+    empty = RESULTS.model_copy(update={"accommodations": []})
+
+    notifications = NotificationBuilder().search_results_notifications(
+        {"alice": RESULTS, "bob": empty, "carol": RESULTS}
+    )
+
+    assert notifications.keys() == {"alice", "carol"}
+    assert notifications["alice"] == notifications["carol"]
@@ -0,0 +1,89 @@
+from typing import Dict, List
+
+import pytest
+
+from src.parser import Parser
+
+SEARCH_URL = "https://trouverunlogement.lescrous.fr/tools/36/search?bounds=1_2_3_4"
+
+
+def card(accommodation_id: int) -> str:
+    return (
+        f"""<li><div class="fr-card"><h3 class="fr-card__title"><a href="/tools/36/accommodations/{accommodation_id}">"""
+        f"""Room {accommodation_id}</a></h3><p class="fr-badge">300 €</p></div></li>"""
+    )
+
+
+def results_page(count: int, ids: List[int], last_page: int) -> str:
+    pagination = "".join(
+        f"""<li><a class="fr-pagination__link" href="?bounds=1_2_3_4&amp;page={page}">{page}</a></li>"""
+        for page in range(1, last_page + 1)
+    )
+    return (
+        f"""<html><body><h2 class="SearchResults-desktop fr-h4">{count} logements trouvés</h2>"""
+        f"""<ul>{"".join(card(i) for i in ids)}</ul>"""
+        f"""<nav class="fr-pagination"><ul class="fr-pagination__list">{pagination}</ul></nav></body></html>"""
+    )
+
+
+class PagesFetcher:
+    def __init__(self, pages: Dict[str, str]):
+        self.pages = pages
+        self.fetched: List[str] = []
+
+    def fetch(self, url: str) -> str:
+        self.fetched.append(url)
+        return self.pages[url]
+
+
+@pytest.mark.parametrize("backend", ["bs4", "lxml"])
+def test_parser_fetches_all_pages(backend):
+    fetcher = PagesFetcher(
+        {
+            SEARCH_URL: results_page(8, [1, 2, 3], last_page=3),
+            f"{SEARCH_URL}&page=2": results_page(8, [4, 5, 6], last_page=3),
+            # A listing moved from page 2 to page 3 between the fetches
+            f"{SEARCH_URL}&page=3": results_page(8, [6, 7], last_page=3),
+        }
+    )
+
+    search_results = Parser(fetcher, backend=backend).get_accommodations(SEARCH_URL)  # type: ignore
+
+    assert [a.id for a in search_results.accommodations] == [1, 2, 3, 4, 5, 6, 7]
+    assert search_results.count == 7
+
+
+@pytest.mark.parametrize("backend", ["bs4", "lxml"])
+def test_parser_stops_once_count_is_satisfied(backend):
+    fetcher = PagesFetcher(
+        {
+            SEARCH_URL: results_page(4, [1, 2], last_page=5),
+            f"{SEARCH_URL}&page=2": results_page(4, [3, 4], last_page=5),
+        }
+    )
+
+    search_results = Parser(
+        fetcher, backend=backend, max_page_workers=1
+    ).get_accommodations(SEARCH_URL)  # type: ignore
+
+    assert [a.id for a in search_results.accommodations] == [1, 2, 3, 4]
+    assert len(fetcher.fetched) == 2
+
+
+def test_parser_does_not_paginate_complete_results():
+    fetcher = PagesFetcher({SEARCH_URL: results_page(2, [1, 2], last_page=2)})
+
+    search_results = Parser(fetcher).get_accommodations(SEARCH_URL)  # type: ignore
+
+    assert search_results.count == 2
+    assert fetcher.fetched == [SEARCH_URL]
+
+
+@pytest.mark.parametrize("backend", ["bs4", "lxml"])
+def test_parser_counts_found_accommodations_without_pagination(backend, caplog):
+    fetcher = PagesFetcher({SEARCH_URL: results_page(5, [1, 2], last_page=1)})
+
+    search_results = Parser(fetcher, backend=backend).get_accommodations(SEARCH_URL)  # type: ignore
+
+    assert search_results.count == 2
+    assert "without pagination links" in caplog.text
@@ -0,0 +1,73 @@
+from src.models import (
+    Accommodation,
+    AccommodationRecord,
+    SearchRecords,
+    SearchResults,
+    UserConf,
+)
+from src.planner import (
+    normalize_search_url,
+    plan_searches,
+    records_for_conf,
+    results_for_conf,
+)
+
+LYON = "https://trouverunlogement.lescrous.fr/tools/36/search?bounds=4.8_45.7_4.9_45.8"
+PARIS = "https://trouverunlogement.lescrous.fr/tools/36/search?bounds=2.2_48.9_2.4_48.8"
+
+
+def test_normalize_search_url():
+    assert normalize_search_url(
+        "HTTPS://TrouverUnLogement.lescrous.fr/tools/36/search/?occupationModes=alone&bounds=1_2_3_4&price=#map"
+    ) == normalize_search_url(
+        "https://trouverunlogement.lescrous.fr/tools/36/search?bounds=1_2_3_4&occupationModes=alone"
+    )
+
+
+def test_plan_searches_groups_identical_searches():
+    confs = [
+        UserConf(conf_title="a", telegram_id="1", search_url=LYON),  # type: ignore
+        UserConf(conf_title="b", telegram_id="2", search_url=PARIS),  # type: ignore
+        UserConf(conf_title="c", telegram_id="3", search_url=LYON + "&"),  # type: ignore
+    ]
+
+    groups = plan_searches(confs)
+
+    assert [[conf.telegram_id for conf in group.user_confs] for group in groups] == [
+        ["1", "3"],
+        ["2"],
+    ]
+
+
+def test_results_for_conf_filters_ignored_ids():
+    search_results = SearchResults(
+        search_url=LYON,  # type: ignore
+        count=2,
+        accommodations=[
+            Accommodation(id=1, title="A", price=100.0),
+            Accommodation(id=2, title="B", price=200.0),
+        ],
+    )
+    conf = UserConf(conf_title="a", telegram_id="1", search_url=LYON, ignored_ids=[2])  # type: ignore
+
+    results = results_for_conf(search_results, conf)
+
+    assert [accommodation.id for accommodation in results.accommodations] == [1]
+    assert len(search_results.accommodations) == 2
+
+
+def test_records_for_conf_filters_ignored_ids():
+    search_records = SearchRecords(
+        LYON,  # type: ignore
+        2,
+        [
+            AccommodationRecord(id=1, title="A", price=100.0),
+            AccommodationRecord(id=2, title="B", price=200.0),
+        ],
+    )
+    conf = UserConf(conf_title="a", telegram_id="1", search_url=PARIS, ignored_ids=[2])  # type: ignore
+
+    records = records_for_conf(search_records, conf)
+
+    assert [record.id for record in records.records] == [1]
+    assert str(records.to_model().search_url) == str(conf.search_url)
@@ -0,0 +1,20 @@
+from time import monotonic
+
+from src.rate_limiter import TokenBucket
+
+
+def test_token_bucket_allows_bursts_up_to_capacity():
+    bucket = TokenBucket(rate=1, capacity=3)
+
+    assert [bucket.try_acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.try_acquire() > 0
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+
+    start = monotonic()
+    for _ in range(6):
+        bucket.acquire()
+
+    assert monotonic() - start >= 5 / 50 * 0.9
@@ -0,0 +1,75 @@
+from datetime import timedelta
+from pathlib import Path
+
+from src.models import Accommodation, UserConf
+from src.seen_store import SeenStore
+
+CONF = UserConf(
+    conf_title="Test",
+    telegram_id="42",
+    search_url="https://trouverunlogement.lescrous.fr/tools/36/search",  # type: ignore
+)
+
+ROOM = Accommodation(id=1, title="Room", price=300.0)
+STUDIO = Accommodation(id=2, title="Studio", price=450.0)
+
+
+def notify(store: SeenStore, conf: UserConf, accommodations) -> list:
+    new_or_changed = store.new_or_changed(conf, accommodations)
+    store.mark_seen(conf, accommodations)
+    return new_or_changed
+
+
+def test_seen_store_only_returns_new_or_changed(tmp_path: Path):
+    store = SeenStore(tmp_path / "seen.sqlite3")
+
+    assert notify(store, CONF, [ROOM]) == [ROOM]
+    assert notify(store, CONF, [ROOM, STUDIO]) == [STUDIO]
+    assert notify(store, CONF, [ROOM, STUDIO]) == []
+
+    cheaper_room = ROOM.model_copy(update={"price": 280.0})
+    assert notify(store, CONF, [cheaper_room, STUDIO]) == [cheaper_room]
+
+
+def test_seen_store_only_records_marked_accommodations(tmp_path: Path):
+    store = SeenStore(tmp_path / "seen.sqlite3")
+
+    assert store.new_or_changed(CONF, [ROOM]) == [ROOM]
+    assert store.new_or_changed(CONF, [ROOM]) == [ROOM]
+
+    store.mark_seen(CONF, [ROOM])
+    assert store.new_or_changed(CONF, [ROOM]) == []
+
+
+def test_seen_store_looks_up_large_batches(tmp_path: Path):
+    store = SeenStore(tmp_path / "seen.sqlite3")
+    accommodations = [
+        Accommodation(id=i, title="Room", price=300.0) for i in range(1, 1201)
+    ]
+
+    store.mark_seen(CONF, accommodations[:1000])
+
+    assert store.new_or_changed(CONF, accommodations) == accommodations[1000:]
+
+
+def test_seen_store_is_per_configuration(tmp_path: Path):
+    store = SeenStore(tmp_path / "seen.sqlite3")
+    other_conf = CONF.model_copy(update={"telegram_id": "43"})
+
+    store.mark_seen(CONF, [ROOM])
+
+    assert store.new_or_changed(other_conf, [ROOM]) == [ROOM]
+
+
+def test_seen_store_persists(tmp_path: Path):
+    SeenStore(tmp_path / "seen.sqlite3").mark_seen(CONF, [ROOM])
+
+    assert SeenStore(tmp_path / "seen.sqlite3").new_or_changed(CONF, [ROOM]) == []
+
+
+def test_seen_store_evicts_expired_entries(tmp_path: Path):
+    store = SeenStore(tmp_path / "seen.sqlite3", ttl=timedelta(seconds=-1))
+    store.mark_seen(CONF, [ROOM])
+
+    assert store.evict_expired() == 1
+    assert store.new_or_changed(CONF, [ROOM]) == [ROOM]
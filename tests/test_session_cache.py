@@ -0,0 +1,42 @@
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from src.session_cache import SessionCache
+
+COOKIES = [
+    {"name": "PHPSESSID", "value": "abc", "domain": "trouverunlogement.lescrous.fr"}
+]
+
+
+def test_session_cache_round_trip(tmp_path: Path):
+    cache = SessionCache(tmp_path / "session.json")
+    cache.save(COOKIES, user_agent="test-agent", rules_validated=True)
+
+    cached = cache.load()
+
+    assert cached is not None
+    assert cached.cookies == COOKIES
+    assert cached.user_agent == "test-agent"
+    assert cached.rules_validated
+
+
+def test_session_cache_expires(tmp_path: Path):
+    cache = SessionCache(tmp_path / "session.json", ttl=timedelta(seconds=-1))
+    cache.save(COOKIES)
+
+    assert cache.load() is None
+
+
+def test_session_cache_expires_with_cookies(tmp_path: Path):
+    cache = SessionCache(tmp_path / "session.json")
+    cache.save([{**COOKIES[0], "expiry": int(time.time()) - 1}])
+
+    assert cache.load() is None
+
+
+def test_session_cache_ignores_corrupted_file(tmp_path: Path):
+    path = tmp_path / "session.json"
+    path.write_text("not json")
+
+    assert SessionCache(path).load() is None
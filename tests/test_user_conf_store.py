@@ -0,0 +1,114 @@
+import os
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from src.models import UserConf
+from src.user_conf_store import (
+    JsonLinesUserConfStore,
+    SqliteUserConfStore,
+    open_user_conf_store,
+)
+
+LYON = "https://trouverunlogement.lescrous.fr/tools/36/search?bounds=4.8_45.7_4.9_45.8"
+PARIS = "https://trouverunlogement.lescrous.fr/tools/36/search?bounds=2.2_48.9_2.4_48.8"
+
+
+def conf_line(telegram_id: str, search_url: str) -> str:
+    return UserConf(
+        conf_title=None, telegram_id=telegram_id, search_url=search_url
+    ).model_dump_json()  # type: ignore
+
+
+def test_json_lines_store(tmp_path: Path):
+    path = tmp_path / "users.jsonl"
+    path.write_text(
+        "\n".join(
+            [
+                conf_line("1", LYON),
+                "{not valid}",
+                "",
+                conf_line("2", PARIS),
+                conf_line("3", LYON),
+            ]
+        )
+    )
+
+    store = open_user_conf_store(path)
+
+    assert isinstance(store, JsonLinesUserConfStore)
+    assert [conf.telegram_id for conf in store.user_confs()] == ["1", "2", "3"]
+    assert [conf.telegram_id for conf in store.get_by_search_url(LYON + "&")] == [
+        "1",
+        "3",
+    ]
+    assert [str(conf.search_url) for conf in store.get_by_telegram_id("2")] == [PARIS]
+    assert store.get_by_telegram_id("4") == []
+
+
+def test_json_lines_store_reloads_incrementally(tmp_path: Path):
+    path = tmp_path / "users.jsonl"
+    path.write_text(conf_line("1", LYON))
+    store = JsonLinesUserConfStore(path)
+    first = store.user_confs()[0]
+
+    assert not store.reload_if_changed()
+
+    path.write_text(conf_line("1", LYON) + "\n" + conf_line("2", PARIS))
+    os.utime(
+        path, ns=(0, 0)
+    )  # make sure the change is noticed on coarse mtime filesystems
+
+    assert store.reload_if_changed()
+    assert [conf.telegram_id for conf in store.user_confs()] == ["1", "2"]
+    assert store.user_confs()[0] is first
+
+
+def test_json_lines_store_retries_failed_loads(tmp_path: Path, monkeypatch):
+    path = tmp_path / "users.jsonl"
+    path.write_text(conf_line("1", LYON))
+    store = JsonLinesUserConfStore(path)
+
+    path.write_text(conf_line("1", LYON) + "\n" + conf_line("2", PARIS))
+    os.utime(path, ns=(0, 0))
+
+    def unreadable(*args, **kwargs):
+        raise PermissionError(path)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(Path, "open", unreadable)
+        with pytest.raises(PermissionError):
+            store.reload_if_changed()
+
+    assert store.reload_if_changed()
+    assert [conf.telegram_id for conf in store.user_confs()] == ["1", "2"]
+
+
+def test_sqlite_store_sees_changes_from_other_connections(tmp_path: Path):
+    path = tmp_path / "users.sqlite3"
+    store = open_user_conf_store(path)
+    assert isinstance(store, SqliteUserConfStore)
+
+    conf_id = store.add(UserConf(conf_title=None, telegram_id="1", search_url=LYON))  # type: ignore
+    assert store.reload_if_changed()
+    assert not store.reload_if_changed()
+
+    other = sqlite3.connect(path)
+    with other:
+        other.execute(
+            "UPDATE user_confs SET conf = ? WHERE id = ?",
+            (conf_line("1", PARIS), conf_id),
+        )
+        other.execute(
+            "INSERT INTO user_confs (conf) VALUES (?)", (conf_line("2", LYON),)
+        )
+    other.close()
+
+    assert store.reload_if_changed()
+    assert [
+        (conf.telegram_id, str(conf.search_url)) for conf in store.user_confs()
+    ] == [
+        ("1", PARIS),
+        ("2", LYON),
+    ]